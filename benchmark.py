@@ -0,0 +1,173 @@
+from __future__ import annotations
+import argparse
+import os
+import time
+from typing import Callable, Dict, List, Tuple, Union
+
+from utils import Rule, Grammar
+from earley import Earley
+from lr import LR
+from practical_earley import PracticalEarley
+from parser import Parser as AutoParser
+from generator import WordGenerator
+from lr_runtime import LRRuntime, table_memory
+
+
+Parser = Union[Earley, LR, PracticalEarley, AutoParser]
+
+LENGTH_SLACK = 8
+
+GRAMMARS = {
+    'brackets': ('S', '()', ['S->(S)S', 'S->'], 'S'),
+    'mixed_brackets': ('S', '()[]{}', ['S->(S)S', 'S->[S]S', 'S->{S}S', 'S->'], 'S'),
+    'a_star': ('S', 'a', ['S->aS', 'S->'], 'S'),
+    'aSbS': ('SA', 'ab', ['A->S', 'S->aSbS', 'S->'], 'A'),
+    'aFb': ('SF', 'ab', ['S->aFbF', 'F->aFb', 'F->'], 'S'),
+    'SaSb': ('S', 'ab', ['S->SaSb', 'S->'], 'S'),
+    'SAB': ('SAB', 'abc', ['S->SABBAabc', 'S->', 'A->', 'B->'], 'S'),
+    'expr': ('ETF', '+*()a', ['E->E+T', 'E->T', 'T->T*F', 'T->F', 'F->(E)', 'F->a'], 'E'),
+    'calc': ('SLETFA', '+-*/()[]abc=;', ['S->L', 'L->A;L', 'L->', 'A->a=E', 'E->E+T', 'E->E-T',
+                                         'E->T', 'T->T*F', 'T->T/F', 'T->F', 'F->(E)',
+                                         'F->[E]', 'F->-F', 'F->a', 'F->b', 'F->c'], 'S'),
+    'ambiguous_sum': ('S', 'a+', ['S->S+S', 'S->a'], 'S'),
+    'expr_prec': ('E', '+*()a', ['E->E+E', 'E->E*E', 'E->(E)', 'E->a'], 'E',
+                  [('left', '+'), ('left', '*')]),
+}
+
+ENGINES = {
+    'earley': Earley,
+    'practical_earley': PracticalEarley,
+    'lr': LR,
+    'auto': AutoParser,
+}
+
+
+def make_grammar(name: str) -> Grammar:
+    nonterms, terms, rules, start, *precedence = GRAMMARS[name]
+    result = Grammar(set(nonterms), set(terms))
+    for row in rules:
+        result.add_rule(Rule(*row.split('->')))
+    for associativity, declared in (precedence[0] if precedence else []):
+        result.declare(associativity, declared)
+    result.start = start
+    return result
+
+
+def corpus(grammar: Grammar, lengths: List[int], count: int,
+           seed: int = 0) -> Tuple[List[str], List[str]]:
+    generator = WordGenerator(grammar, max(lengths) + LENGTH_SLACK, seed)
+    positives = []
+    negatives = []
+    for length in lengths:
+        length = next((n for n in range(length, length + LENGTH_SLACK + 1)
+                       if generator.count(n)), None)
+        if length is None:
+            continue
+        positives.extend(generator.words(length, count))
+        negatives.extend(generator.negatives(length, count))
+    return positives, negatives
+
+
+def measure(engine: Callable[[], Parser], grammar: Grammar,
+            words: List[str]) -> Dict[str, object]:
+    parser = engine(collect_stats=True)
+    started = time.perf_counter()
+    try:
+        parser.fit(grammar)
+    except Exception as e:
+        return {'error': str(e)}
+    fitted = time.perf_counter()
+    accepted = sum(parser.predict(word) for word in words)
+    finished = time.perf_counter()
+    return {
+        'fit': fitted - started,
+        'predict': finished - fitted,
+        'accepted': accepted,
+        'items': parser.stats.counters.get('items', 0),
+        'reduce': parser.stats.counters.get('reduce', 0),
+        'engine': getattr(parser, 'engine_name', None),
+        'reason': getattr(parser, 'reason', None),
+    }
+
+
+def memory(grammar: Grammar) -> Dict[str, int]:
+    parser = LR()
+    parser.fit(grammar)
+    return {
+        'states': len(parser.table),
+        'table': table_memory(parser),
+        'dense': LRRuntime.from_lr(parser).nbytes,
+        'compressed': LRRuntime.from_lr(parser, compress=True).nbytes,
+    }
+
+
+def chart_sizes(grammar: Grammar, words: List[str]) -> Dict[str, int]:
+    result = {}
+    for name, lookahead in [('items', False), ('lookahead_items', True)]:
+        parser = Earley(collect_stats=True, use_dfa=False, lookahead=lookahead)
+        parser.fit(grammar)
+        for word in words:
+            parser.predict(word)
+        result[name] = parser.stats.counters.get('items', 0)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--grammars', nargs='*', default=sorted(GRAMMARS))
+    parser.add_argument('--engines', nargs='*', default=sorted(ENGINES))
+    parser.add_argument('--lengths', nargs='*', type=int, default=[4, 16, 64])
+    parser.add_argument('--count', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--corpus-dir')
+    parser.add_argument('--memory', action='store_true')
+    parser.add_argument('--chart', action='store_true')
+    args = parser.parse_args()
+
+    for name in args.grammars:
+        grammar = make_grammar(name)
+        if args.memory:
+            try:
+                result = memory(grammar)
+            except Exception as e:
+                print(f'{name:16} {e}')
+                continue
+            print(f'{name:16} states={result["states"]:<5} table={result["table"]:>8}B '
+                  f'dense={result["dense"]:>7}B compressed={result["compressed"]:>7}B')
+            continue
+        positives, negatives = corpus(grammar, args.lengths, args.count, args.seed)
+        if args.corpus_dir is not None:
+            os.makedirs(args.corpus_dir, exist_ok=True)
+            with open(os.path.join(args.corpus_dir, f'{name}.positive'), 'w') as file:
+                file.writelines(word + '\n' for word in positives)
+            with open(os.path.join(args.corpus_dir, f'{name}.negative'), 'w') as file:
+                file.writelines(word + '\n' for word in negatives)
+        words = positives + negatives
+        if args.chart:
+            result = chart_sizes(grammar, words)
+            saved = 1 - result['lookahead_items'] / result['items'] if result['items'] else 0.0
+            print(f'{name:16} items={result["items"]:<8} '
+                  f'lookahead_items={result["lookahead_items"]:<8} saved={saved:6.1%}')
+            continue
+        results = {}
+        for engine in args.engines:
+            result = measure(ENGINES[engine], grammar, words)
+            if 'error' in result:
+                print(f'{name:16} {engine:18} {result["error"]}')
+                continue
+            results[engine] = result
+            print(f'{name:16} {engine:18} fit={result["fit"] * 1000:9.3f}ms '
+                  f'predict={result["predict"] * 1000:10.3f}ms '
+                  f'accepted={result["accepted"]}/{len(words)} '
+                  f'items={result["items"]} reduce={result["reduce"]}')
+        fixed = [result['fit'] + result['predict'] for engine, result in results.items()
+                 if engine != 'auto']
+        if 'auto' in results and fixed:
+            auto = results['auto']
+            verdict = 'ok' if auto['fit'] + auto['predict'] <= max(fixed) else 'SLOWER'
+            print(f'{name:16} {"auto":18} chose {auto["engine"]} ({auto["reason"]}), '
+                  f'{verdict} against the slowest fixed engine')
+
+
+if __name__ == '__main__':
+    main()
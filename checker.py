@@ -1,10 +1,13 @@
 from __future__ import annotations
-from typing import Union
+from typing import Optional, Union
 
 from utils import Rule, Grammar
 
 
-def check(algorithm: Union[Earley, LR]) -> None:
+def check(algorithm: Optional[Union[Earley, LR, Parser]] = None) -> None:
+    if algorithm is None:
+        from parser import Parser
+        algorithm = Parser()
     try:
         nonterm_count, term_count, rules_count = [int(x) for x in input().split()]
         nonterms = {x for x in input()}
@@ -36,7 +39,6 @@ def check(algorithm: Union[Earley, LR]) -> None:
     words_count = int(input())
     for _ in range(words_count):
         word = input()
-        for letter in word:
-            if not grammar.is_terminal(letter):
-                raise Exception('Wrong word')
+        if not grammar.is_word(word):
+            raise Exception('Wrong word')
         print('Yes' if algorithm.predict(word) else 'No')
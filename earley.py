@@ -1,9 +1,13 @@
 from __future__ import annotations
+from collections import Counter
 from copy import deepcopy as copy
-from typing import Set, List
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
 
-from utils import Rule, Grammar
+from utils import Rule, Grammar, Word, Budget, as_symbols, symbol_codes
 from checker import check
+from stats import Stats
+from regular import DFA
+from prefilter import Prefilter
 
 
 REAL_START = '#'
@@ -52,37 +56,241 @@ class Earley:
                              self.parent.i, self.parent.point_position))
             return hash((self.rule, self.i, self.point_position, self.parent))
 
-    def __init__(self) -> Earley:
+    def __init__(self, collect_stats: bool = False, use_dfa: bool = True,
+                 use_prefilter: bool = True, memory_bounded: bool = False,
+                 lookahead: bool = True) -> Earley:
         self.grammar = None
+        self.memory_bounded = memory_bounded
+        self.lookahead = lookahead
+        self.use_dfa = use_dfa
+        self.dfa = None
+        self.use_prefilter = use_prefilter
+        self.prefilter = None
+        self.symbols = None
+        self.nullable = None
+        self.first_sets = None
+        self.rules_by_left = None
+        self.prediction = None
+        self.lookahead_prediction = None
+        self.stale = False
+        self._dirty = set()
+        self._removed = False
+        self._prediction_deps = None
+        self.stats = Stats('earley') if collect_stats else None
 
     def fit(self, grammar: Grammar) -> None:
+        self.detach()
         self.grammar = grammar
+        grammar.subscribe(self._on_change)
+        self.symbols = symbol_codes(grammar.terms)
+        self.nullable = grammar.nullable()
+        self.first_sets = grammar.first_sets(self.nullable)
+        self.rules_by_left = grammar.rules_by_left()
+        self.prediction = {}
+        self.lookahead_prediction = {}
+        self._prediction_deps = {}
+        for nonterm in self.rules_by_left:
+            self._prediction_closure(nonterm)
+        self._rebuild_filters()
+        self.stale = False
+        self._dirty = set()
+        self._removed = False
+        if self.stats is not None:
+            self.stats.reset()
 
-    def predict(self, word: str) -> bool:
-        D = [set() for i in range(len(word) + 1)]
+    def detach(self) -> None:
+        if self.grammar is not None:
+            self.grammar.unsubscribe(self._on_change)
+
+    def _on_change(self, rule: Optional[Rule], added: bool) -> None:
+        if rule is None:
+            return
+        if added:
+            self.rules_by_left.setdefault(rule.left, []).append(rule)
+        else:
+            self.rules_by_left[rule.left].remove(rule)
+            self._removed = True
+        self._dirty.add(rule.left)
+        self.stale = True
+
+    def refit(self) -> None:
+        if not self.stale:
+            return
+        if self._removed:
+            nullable = self.grammar.nullable()
+            first_sets = self.grammar.first_sets(nullable)
+        else:
+            nullable = self.grammar.nullable(self.nullable)
+            first_sets = self.grammar.first_sets(nullable, self.first_sets)
+        dirty = self._dirty | (nullable ^ self.nullable)
+        dirty.update(nonterm for nonterm, terms in first_sets.items()
+                     if terms != self.first_sets.get(nonterm))
+        self.nullable = nullable
+        self.first_sets = first_sets
+        for nonterm in self.rules_by_left:
+            if ((nonterm not in self.prediction) or
+                    (self._prediction_deps[nonterm] & dirty)):
+                self._prediction_closure(nonterm)
+                if self.stats is not None:
+                    self.stats.add('refit_predictions')
+        self._rebuild_filters(not self._removed)
+        self.stale = False
+        self._dirty = set()
+        self._removed = False
+
+    def _rebuild_filters(self, incremental: bool = False) -> None:
+        if not incremental or self.dfa is not None:
+            self.dfa = DFA.from_grammar(self.grammar) if self.use_dfa else None
+        known = self.prefilter if incremental else None
+        self.prefilter = Prefilter(self.grammar, known) if self.use_prefilter else None
+
+    def _prediction_closure(self, nonterm: str) -> FrozenSet[Tuple[Rule, int]]:
+        result = set()
+        opened = [nonterm]
+        used = {nonterm}
+        while opened:
+            for rule in self.rules_by_left.get(opened.pop(), []):
+                for point_position, letter in enumerate(rule.right):
+                    result.add((rule, point_position))
+                    if letter in self.grammar.terms:
+                        break
+                    if letter not in used:
+                        used.add(letter)
+                        opened.append(letter)
+                    if letter not in self.nullable:
+                        break
+                else:
+                    result.add((rule, len(rule.right)))
+        self.prediction[nonterm] = frozenset(result)
+        lookahead_prediction = {None: set()}
+        for rule, point_position in result:
+            rest = rule.right[point_position:]
+            used.update(letter for letter in rest if letter not in self.grammar.terms)
+            next_terms, rest_nullable = self._first(rest)
+            for term in next_terms:
+                lookahead_prediction.setdefault(term, set()).add((rule, point_position))
+            if rest_nullable:
+                lookahead_prediction[None].add((rule, point_position))
+        for term, items in lookahead_prediction.items():
+            if term is not None:
+                items |= lookahead_prediction[None]
+        self.lookahead_prediction[nonterm] = {term: frozenset(items)
+                                              for term, items in lookahead_prediction.items()}
+        self._prediction_deps[nonterm] = used
+        return self.prediction[nonterm]
+
+    def _first(self, w: str) -> Tuple[Set[str], bool]:
+        result = set()
+        for letter in w:
+            if letter in self.grammar.terms:
+                result.add(letter)
+                return result, False
+            result |= self.first_sets.get(letter, set())
+            if letter not in self.nullable:
+                return result, False
+        return result, True
+
+    def predict(self, word: Word, max_items: Optional[int] = None,
+                deadline: Optional[float] = None) -> bool:
+        if self.stale:
+            self.refit()
+        if self.dfa is not None:
+            if self.stats is not None:
+                self.stats.add('dfa_words')
+            return self.dfa.predict(word)
+        if self.prefilter is not None and not self.prefilter.accepts(word):
+            if self.stats is not None:
+                self.stats.add('prefiltered')
+            return False
+        word = as_symbols(word, self.symbols)
+        budget = None
+        if max_items is not None or deadline is not None:
+            budget = Budget(max_items, deadline, self.stats)
+        bounded = self.memory_bounded
+        if bounded:
+            D = {0: set()}
+            refs = Counter()
+            origins = {}
+            frontier = set()
+        else:
+            D = [set() for i in range(len(word) + 1)]
         D[0] = set([self.Configuration(Rule(REAL_START, self.grammar.start,), 0, 0, None)])
+        stats = self.stats
+        chart_size = 0
+        if stats is not None:
+            stats.columns = []
+            stats.add('words')
         for i in range(len(word) + 1):
+            if bounded and i < len(word):
+                D[i + 1] = set()
             current_D = [x for x in D[i]]
+            predicted_nonterms = set()
             conf_index = 0
-            count = 0
+            predicted = scanned = completed = 0
             while conf_index < len(current_D):
-                count += 1
                 conf = current_D[conf_index]
                 if len(conf.rule.right) != conf.point_position:
                     if ((len(conf.rule.right) > conf.point_position) and
                             (conf.rule.right[conf.point_position] not in self.grammar.terms)):
-                        self._predict(conf, D, i, current_D)
+                        self._predict(conf, D, i, current_D, predicted_nonterms,
+                                      word[i] if i < len(word) else None)
+                        predicted += 1
                     elif i < len(word):
                         self._scan(conf, D, i, word[i])
+                        scanned += 1
                 else:
                     D[i] = set(current_D)
                     self._complete(conf, D, i, current_D)
+                    completed += 1
                 conf_index += 1
+                if budget is not None:
+                    budget.spend(i)
 
             D[i] = set(current_D)
+            if stats is not None:
+                if bounded:
+                    stats.maximum('peak_items', sum(map(len, D.values())))
+                else:
+                    chart_size += len(current_D)
+                    stats.maximum('peak_items', chart_size + len(D[i + 1] if i < len(word) else ()))
+                    stats.column(items=len(current_D), predict=predicted, scan=scanned,
+                                 complete=completed)
+                stats.add('items', len(current_D))
+                stats.add('predict', predicted)
+                stats.add('scan', scanned)
+                stats.add('complete', completed)
+            if bounded and i < len(word):
+                if not D[i + 1]:
+                    return False
+                frontier = self._prune(D, i, refs, origins, frontier)
+                if stats is not None:
+                    stats.maximum('peak_columns', len(D))
 
         return self.Configuration(Rule(REAL_START, self.grammar.start), 0, 1, None) in D[len(word)]
 
+    def _prune(self, D: Dict[int, Set[self.Configuration]], i: int, refs: Counter,
+               origins: Dict[int, Set[int]], frontier: Set[int]) -> Set[int]:
+        D[i] = {conf for conf in D[i]
+                if ((len(conf.rule.right) > conf.point_position) and
+                    (conf.rule.right[conf.point_position] not in self.grammar.terms))}
+        origins[i] = {conf.i for conf in D[i]} - {i}
+        refs.update(origins[i])
+        new_frontier = {conf.i for conf in D[i + 1]}
+        refs.update(new_frontier)
+        refs.subtract(frontier)
+        dead = [k for k in frontier | {i} if refs[k] <= 0]
+        while dead:
+            k = dead.pop()
+            if k not in origins:
+                continue
+            del D[k]
+            del refs[k]
+            for origin in origins.pop(k):
+                refs[origin] -= 1
+                if refs[origin] <= 0:
+                    dead.append(origin)
+        return new_frontier
+
     def _scan(self, conf: self.Configuration, D: List[Set[self.Configuration]],
               j: int, letter: str) -> None:
         if ((len(conf.rule.right) > conf.point_position) and
@@ -90,14 +298,28 @@ class Earley:
             D[j + 1].add(self.Configuration(conf.rule, conf.i, conf.point_position + 1, conf.parent))
 
     def _predict(self, conf: Configuration, D: List[Set[self.Configuration]],
-                 j: int, current_D: List[self.Configuration]) -> None:
-        for rule in self.grammar.rules():
-            if ((len(conf.rule.right) > conf.point_position) and
-                    (conf.rule.right[conf.point_position] == rule.left)):
-                adding_conf = self.Configuration(rule, j, 0, conf)
-                if adding_conf not in D[j]:
-                    current_D.append(adding_conf)
-                    D[j].add(adding_conf)
+                 j: int, current_D: List[self.Configuration],
+                 predicted_nonterms: Set[str], letter: Optional[str]) -> None:
+        nonterm = conf.rule.right[conf.point_position]
+        if nonterm in self.nullable:
+            adding_conf = self.Configuration(conf.rule, conf.i, conf.point_position + 1,
+                                             conf.parent)
+            if adding_conf not in D[j]:
+                current_D.append(adding_conf)
+                D[j].add(adding_conf)
+        if nonterm in predicted_nonterms:
+            return
+        predicted_nonterms.add(nonterm)
+        if self.lookahead:
+            predictions = self.lookahead_prediction.get(nonterm, {})
+            predictions = predictions.get(letter, predictions.get(None, ()))
+        else:
+            predictions = self.prediction.get(nonterm, ())
+        adding_confs = {self.Configuration(rule, j, point_position, None)
+                        for rule, point_position in predictions}
+        adding_confs -= D[j]
+        current_D.extend(adding_confs)
+        D[j] |= adding_confs
 
     def _complete(self, conf: Configuration, D: List[Set[self.Configuration]],
                   j: int, current_D: List[self.Configuration]) -> None:
@@ -0,0 +1,181 @@
+from __future__ import annotations
+import random
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+
+from utils import Grammar
+from earley import Earley
+from lr import LR
+
+
+class WordGenerator:
+    def __init__(self, grammar: Grammar, max_length: int,
+                 seed: Optional[int] = None) -> WordGenerator:
+        self.grammar = grammar
+        self.max_length = max_length
+        self.random = random.Random(seed)
+        self.terms = sorted(grammar.terms)
+        self.nullable = grammar.nullable()
+        self.rules_by_left = grammar.rules_by_left()
+        self.units = {nonterm: self._unit_closure(nonterm) for nonterm in self.rules_by_left}
+        self.counts = {nonterm: [1 if nonterm in self.nullable else 0]
+                       for nonterm in self.rules_by_left}
+        self.nonunit_counts = {nonterm: [0] for nonterm in self.rules_by_left}
+        self.suffix_counts = {}
+        self.strict_suffix_counts = {}
+        for rule in self.grammar.rules():
+            self.suffix_counts[rule] = [[int(all(letter in self.nullable
+                                                 for letter in rule.right[position:]))]
+                                        for position in range(len(rule.right) + 1)]
+            self.strict_suffix_counts[rule] = [[0] for _ in range(len(rule.right) + 1)]
+        for length in range(1, max_length + 1):
+            self._count_length(length)
+
+    def count(self, length: int, nonterm: Optional[str] = None) -> int:
+        nonterm = self.grammar.start if nonterm is None else nonterm
+        return self.counts[nonterm][length] if length <= self.max_length else 0
+
+    def word(self, length: int) -> str:
+        if self.count(length) == 0:
+            raise Exception(f'No words of length {length}')
+        result = []
+        tasks = [(self.grammar.start, length)]
+        while tasks:
+            symbol, symbol_length = tasks.pop()
+            if symbol in self.grammar.terms:
+                result.append(symbol)
+            elif symbol_length > 0:
+                tasks.extend(reversed(self._expand(symbol, symbol_length)))
+        return ''.join(result)
+
+    def words(self, length: int, count: int) -> Iterator[str]:
+        for _ in range(count):
+            yield self.word(length)
+
+    def mutate(self, word: str) -> str:
+        position = self.random.randrange(len(word) + 1)
+        operations = ['insert']
+        if word:
+            operations.append('delete')
+        if position < len(word) and len(self.terms) > 1:
+            operations.append('replace')
+        if position + 1 < len(word) and word[position] != word[position + 1]:
+            operations.append('swap')
+        operation = self.random.choice(operations)
+        if operation == 'insert':
+            return word[:position] + self.random.choice(self.terms) + word[position:]
+        if operation == 'delete':
+            position = min(position, len(word) - 1)
+            return word[:position] + word[position + 1:]
+        if operation == 'replace':
+            letter = self.random.choice([term for term in self.terms if term != word[position]])
+            return word[:position] + letter + word[position + 1:]
+        return word[:position] + word[position + 1] + word[position] + word[position + 2:]
+
+    def negatives(self, length: int, count: int, parser: Optional[Union[Earley, LR]] = None,
+                  attempts: int = 100) -> Iterator[str]:
+        for _ in range(count):
+            for _ in range(attempts):
+                word = self.mutate(self.word(length))
+                if parser is None or not parser.predict(word):
+                    yield word
+                    break
+
+    def write(self, path: str, lengths: Sequence[int], count: int, negative: bool = False,
+              parser: Optional[Union[Earley, LR]] = None) -> int:
+        written = 0
+        with open(path, 'w') as file:
+            for length in lengths:
+                if self.count(length) == 0:
+                    continue
+                if negative:
+                    words = self.negatives(length, count, parser)
+                else:
+                    words = self.words(length, count)
+                for word in words:
+                    file.write(word + '\n')
+                    written += 1
+        return written
+
+    def _unit_closure(self, nonterm: str) -> List[str]:
+        result = [nonterm]
+        used = {nonterm}
+        i = 0
+        while i < len(result):
+            for rule in self.rules_by_left.get(result[i], []):
+                for position, letter in enumerate(rule.right):
+                    rest = rule.right[:position] + rule.right[position + 1:]
+                    if ((letter in self.rules_by_left) and (letter not in used) and
+                            all(other in self.nullable for other in rest)):
+                        used.add(letter)
+                        result.append(letter)
+            i += 1
+        return result
+
+    def _weight(self, letter: str, length: int) -> int:
+        if letter in self.grammar.terms:
+            return 1 if length == 1 else 0
+        if letter not in self.counts:
+            return 0
+        return self.counts[letter][length]
+
+    def _count_length(self, length: int) -> None:
+        for rule, strict in self.strict_suffix_counts.items():
+            full = self.suffix_counts[rule]
+            strict[-1].append(0)
+            for position in range(len(rule.right) - 1, -1, -1):
+                letter = rule.right[position]
+                if letter in self.grammar.terms:
+                    value = full[position + 1][length - 1]
+                else:
+                    value = sum(self._weight(letter, part) * full[position + 1][length - part]
+                                for part in range(1, length))
+                    if letter in self.nullable:
+                        value += strict[position + 1][length]
+                strict[position].append(value)
+        for nonterm, rules in self.rules_by_left.items():
+            self.nonunit_counts[nonterm].append(
+                sum(self.strict_suffix_counts[rule][0][length] for rule in rules))
+        for nonterm, units in self.units.items():
+            self.counts[nonterm].append(sum(self.nonunit_counts[unit][length] for unit in units))
+        for rule, full in self.suffix_counts.items():
+            full[-1].append(0)
+            for position in range(len(rule.right) - 1, -1, -1):
+                letter = rule.right[position]
+                full[position].append(sum(self._weight(letter, part) *
+                                          full[position + 1][length - part]
+                                          for part in range(length + 1)))
+
+    def _choose(self, options: List[Tuple[int, object]]) -> object:
+        point = self.random.randrange(sum(weight for weight, _ in options))
+        for weight, value in options:
+            if point < weight:
+                return value
+            point -= weight
+
+    def _expand(self, nonterm: str, length: int) -> List[Tuple[str, int]]:
+        unit = self._choose([(self.nonunit_counts[unit][length], unit)
+                             for unit in self.units[nonterm]])
+        rule = self._choose([(self.strict_suffix_counts[rule][0][length], rule)
+                             for rule in self.rules_by_left[unit]])
+        full = self.suffix_counts[rule]
+        strict = self.strict_suffix_counts[rule]
+        result = []
+        is_strict = True
+        for position, letter in enumerate(rule.right):
+            options = []
+            if letter in self.grammar.terms:
+                options.append((full[position + 1][length - 1] if length else 0, 1))
+            else:
+                for part in range(length + 1):
+                    if is_strict and part == length:
+                        continue
+                    if is_strict and part == 0:
+                        weight = strict[position + 1][length] if letter in self.nullable else 0
+                    else:
+                        weight = self._weight(letter, part) * full[position + 1][length - part]
+                    options.append((weight, part))
+            part = self._choose(options)
+            is_strict = is_strict and part == 0
+            result.append((letter, part))
+            length -= part
+        return result
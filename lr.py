@@ -1,21 +1,61 @@
 from __future__ import annotations
-from copy import deepcopy as copy
-from typing import Set
+import threading
+from contextlib import nullcontext
+from typing import ContextManager, FrozenSet, Optional, Set, Union
 
-from utils import Rule, Grammar
+from utils import Rule, Grammar, Word, Budget, as_codes, symbol_codes
 from checker import check
+from stats import Stats
+from regular import DFA
+from prefilter import Prefilter
 
 
 REAL_START = '#'
 END_SYMBOL = '$'
 
 
+class NotLR1Grammar(Exception):
+    def __init__(self, state: int, symbol: str) -> NotLR1Grammar:
+        super().__init__('Not LR(1) grammar')
+        self.state = state
+        self.symbol = symbol
+
+
 class LR:
-    def __init__(self) -> LR:
+    def __init__(self, collect_stats: bool = False, lazy: bool = False,
+                 use_dfa: bool = True, use_prefilter: bool = True) -> LR:
         self.grammar = None
+        self.use_dfa = use_dfa
+        self.dfa = None
+        self.use_prefilter = use_prefilter
+        self.prefilter = None
+        self.symbols = None
         self.nodes = None
-        self.nodes_set = None
+        self.nodes_index = None
         self.table = None
+        self.rules_by_left = None
+        self.nullable = None
+        self.first_sets = None
+        self.stale = False
+        self._dirty = set()
+        self._removed = False
+        self._closures = {}
+        self._closure_deps = {}
+        self.lazy = lazy
+        self.conflicts = []
+        self._failed = {}
+        self._pending = None
+        self._lock = threading.RLock()
+        self.stats = Stats('lr') if collect_stats else None
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
 
     class Configuration:
         def __init__(self, rule: Rule, next_symbol: str, point_position: int) -> Configuration:
@@ -63,7 +103,7 @@ class LR:
             return not self.__eq__(other)
 
         def __hash__(self) -> int:
-            return hash(tuple(self.confs))
+            return hash(frozenset(self.confs))
 
     class Shift:
         def __init__(self, to: int) -> Shift:
@@ -86,12 +126,98 @@ class LR:
             return self.__repr__()
 
     def fit(self, grammar: Grammar) -> None:
+        self.detach()
         self.grammar = grammar
+        grammar.subscribe(self._on_change)
+        self.symbols = symbol_codes(grammar.terms)
+        self.rules_by_left = grammar.rules_by_left()
+        self.nullable = grammar.nullable()
+        self.first_sets = grammar.first_sets(self.nullable)
+        self._closures = {}
+        self._closure_deps = {}
+        if self.stats is not None:
+            self.stats.reset()
+        self._build()
+
+    def _build(self) -> None:
+        self.conflicts = []
+        self._failed = {}
+        self.dfa = None
+        self.prefilter = Prefilter(self.grammar) if self.use_prefilter else None
+        if self.lazy:
+            with self._phase('nodes'):
+                self._build_start_node()
+            self.table = [None]
+            self._pending = [None]
+        else:
+            with self._phase('nodes'):
+                self._build_nodes()
+            with self._phase('fill_table'):
+                self._build_table()
+            if self.use_dfa and not self.grammar.precedence:
+                with self._phase('dfa'):
+                    self.dfa = DFA.from_grammar(self.grammar)
+            if self.stats is not None:
+                self.stats.counters['states'] = len(self.nodes)
+        self.stale = False
+        self._dirty = set()
+        self._removed = False
+
+    def detach(self) -> None:
+        if self.grammar is not None:
+            self.grammar.unsubscribe(self._on_change)
+
+    def _on_change(self, rule: Optional[Rule], added: bool) -> None:
+        with self._lock:
+            if rule is None:
+                self.stale = True
+                return
+            if added:
+                self.rules_by_left.setdefault(rule.left, []).append(rule)
+            else:
+                self.rules_by_left[rule.left].remove(rule)
+                self._removed = True
+            self._dirty.add(rule.left)
+            self.stale = True
+
+    def refit(self) -> None:
+        with self._lock:
+            if not self.stale:
+                return
+            with self._phase('refit'):
+                if self._removed:
+                    nullable = self.grammar.nullable()
+                    first_sets = self.grammar.first_sets(nullable)
+                else:
+                    nullable = self.grammar.nullable(self.nullable)
+                    first_sets = self.grammar.first_sets(nullable, self.first_sets)
+                dirty = self._dirty | (nullable ^ self.nullable)
+                dirty.update(nonterm for nonterm, terms in first_sets.items()
+                             if terms != self.first_sets.get(nonterm))
+                self.nullable = nullable
+                self.first_sets = first_sets
+                for kernel, deps in list(self._closure_deps.items()):
+                    if deps & dirty:
+                        del self._closures[kernel]
+                        del self._closure_deps[kernel]
+                        if self.stats is not None:
+                            self.stats.add('closures_invalidated')
+                self._build()
+
+    def _phase(self, name: str) -> ContextManager[None]:
+        if self.stats is None:
+            return nullcontext()
+        return self.stats.timer(name)
+
+    def _build_start_node(self) -> None:
         self.nodes = [self.Node()]
-        self.nodes[0].confs.add(self.Configuration(Rule(REAL_START, grammar.start),
+        self.nodes[0].confs.add(self.Configuration(Rule(REAL_START, self.grammar.start),
                                                    END_SYMBOL, 0))
         self.nodes[0] = self.closure(self.nodes[0])
-        self.nodes_set = {self.nodes[0]}
+        self.nodes_index = {self.nodes[0]: 0}
+
+    def _build_nodes(self) -> None:
+        self._build_start_node()
         i = 0
         while i < len(self.nodes):
             processed = set()
@@ -102,55 +228,111 @@ class LR:
                     processed.add(conf.rule.right[conf.point_position])
             i += 1
 
+    def _build_table(self) -> None:
         self.table = [{} for _ in range(len(self.nodes))]
         self.fill_table(0, set())
 
-    def predict(self, word: str) -> bool:
-        word += END_SYMBOL
+    def predict(self, word: Word, max_items: Optional[int] = None,
+                deadline: Optional[float] = None) -> bool:
+        if self.stale:
+            self.refit()
+        if self.dfa is not None:
+            if self.stats is not None:
+                self.stats.add('dfa_words')
+            return self.dfa.predict(word)
+        if self.prefilter is not None and not self.prefilter.accepts(word):
+            if self.stats is not None:
+                self.stats.add('prefiltered')
+            return False
+        codes = not isinstance(word, str)
+        if codes:
+            word = as_codes(word)
         stack = [0]
+        stats = self.stats
+        if stats is not None:
+            stats.add('words')
+        budget = None
+        if max_items is not None or deadline is not None:
+            budget = Budget(max_items, deadline, stats)
         i = 0
-        while i < len(word):
-            alpha = word[i]
+        while i <= len(word):
+            if budget is not None:
+                budget.spend(i)
+            if i == len(word):
+                alpha = END_SYMBOL
+            elif codes:
+                alpha = self.symbols.get(word[i])
+            else:
+                alpha = word[i]
             stack_back = stack[-1]
-            if alpha not in self.table[stack_back]:
+            if self.lazy:
+                action = self.action(stack_back, alpha)
+            else:
+                action = self.table[stack_back].get(alpha)
+            if action is None:
                 return False
-            if isinstance(self.table[stack_back][alpha], self.Reduce):
-                if self.table[stack_back][alpha].rule == Rule(REAL_START, self.grammar.start):
-                    if i == (len(word) - 1):
+            if isinstance(action, self.Reduce):
+                if action.rule == Rule(REAL_START, self.grammar.start):
+                    if i == len(word):
                         return True
                     return False
-                if (len(self.table[stack_back][alpha].rule.right) * 2) >= len(stack):
+                if (len(action.rule.right) * 2) >= len(stack):
                     return False
-                next_stack_elem = self.table[stack_back][alpha].rule.left
-                rule_len = len(self.table[stack_back][alpha].rule.right)
+                next_stack_elem = action.rule.left
+                rule_len = len(action.rule.right)
                 stack = stack[:len(stack) - (rule_len * 2)]
                 stack_back = stack[-1]
                 stack.append(next_stack_elem)
-                stack.append(self.table[stack_back][next_stack_elem].to)
-
-            elif isinstance(self.table[stack_back][alpha], self.Shift):
+                if self.lazy:
+                    stack.append(self.action(stack_back, next_stack_elem).to)
+                else:
+                    stack.append(self.table[stack_back][next_stack_elem].to)
+                if stats is not None:
+                    stats.add('reduce')
+                    stats.maximum('max_stack_depth', len(stack) // 2)
+
+            elif isinstance(action, self.Shift):
                 stack.append(alpha)
-                stack.append(self.table[stack_back][alpha].to)
+                stack.append(action.to)
                 i += 1
+                if stats is not None:
+                    stats.add('shift')
+                    stats.maximum('max_stack_depth', len(stack) // 2)
         return False
 
     def closure(self, node: self.Node) -> self.Node:
-        changed = True
-        while changed:
-            new_node = copy(node)
-            changed = False
-            for conf in node.confs:
-                for rule in self.grammar.rules():
-                    if ((len(conf.rule.right) > conf.point_position) and
-                            (conf.rule.right[conf.point_position] == rule.left)):
-                        for next_symbol in self.first(conf.rule.right[conf.point_position + 1:] +
-                                                      conf.next_symbol, set()):
-                            if self.Configuration(rule, next_symbol, 0) not in new_node.confs:
-                                new_node.confs.add(self.Configuration(rule, next_symbol, 0))
-                                changed = True
-            node = new_node
-
-        return node
+        kernel = frozenset(node.confs)
+        confs = self._closures.get(kernel)
+        if confs is None:
+            confs = self._closure(kernel)
+        elif self.stats is not None:
+            self.stats.add('closure_cache_hits')
+        result = self.Node()
+        result.confs = set(confs)
+        return result
+
+    def _closure(self, kernel: FrozenSet[Configuration]) -> FrozenSet[Configuration]:
+        result = set(kernel)
+        opened = list(kernel)
+        deps = set()
+        while opened:
+            if self.stats is not None:
+                self.stats.add('closure_iterations')
+            conf = opened.pop()
+            rest = conf.rule.right[conf.point_position:]
+            deps.update(letter for letter in rest if letter not in self.grammar.terms)
+            if not rest or rest[0] in self.grammar.terms:
+                continue
+            next_symbols = self.first(rest[1:] + conf.next_symbol)
+            for rule in self.rules_by_left.get(rest[0], []):
+                for next_symbol in next_symbols:
+                    adding_conf = self.Configuration(rule, next_symbol, 0)
+                    if adding_conf not in result:
+                        result.add(adding_conf)
+                        opened.append(adding_conf)
+        self._closures[kernel] = frozenset(result)
+        self._closure_deps[kernel] = frozenset(deps)
+        return self._closures[kernel]
 
     def goto(self, i: int, char: str) -> None:
         new_node = self.Node()
@@ -161,12 +343,86 @@ class LR:
                                                       conf.next_symbol,
                                                       conf.point_position + 1))
         new_node = self.closure(new_node)
-        if new_node not in self.nodes_set:
+        if new_node not in self.nodes_index:
+            self.nodes_index[new_node] = len(self.nodes)
             self.nodes.append(new_node)
-            self.nodes_set.add(new_node)
         if char in self.nodes[i].children:
-            raise Exception('Not LR(1) grammar')
-        self.nodes[i].children[char] = self.nodes.index(new_node)
+            raise NotLR1Grammar(i, char)
+        self.nodes[i].children[char] = self.nodes_index[new_node]
+
+    def action(self, i: int, symbol: str) -> Optional[Union[Shift, Reduce]]:
+        row = self.table[i]
+        if row is not None:
+            action = row.get(symbol)
+            if action is not None:
+                return action
+            if symbol not in self._pending[i]:
+                return row.get(symbol)
+        with self._lock:
+            if self.table[i] is None:
+                if i in self._failed:
+                    raise NotLR1Grammar(i, self._failed[i])
+                try:
+                    self._build_row(i)
+                except NotLR1Grammar as e:
+                    self._failed[i] = e.symbol
+                    raise
+            row = self.table[i]
+            if symbol in self._pending[i]:
+                self.goto(i, symbol)
+                self.table.extend([None] * (len(self.nodes) - len(self.table)))
+                self._pending.extend([None] * (len(self.nodes) - len(self._pending)))
+                row[symbol] = self.Shift(self.nodes[i].children[symbol])
+                self._pending[i] = self._pending[i] - {symbol}
+                if self.stats is not None:
+                    self.stats.counters['states'] = len(self.nodes)
+            return row.get(symbol)
+
+    def warm(self, background: bool = False) -> Optional[threading.Thread]:
+        if not background:
+            self._warm()
+            return None
+        thread = threading.Thread(target=self._warm, daemon=True)
+        thread.start()
+        return thread
+
+    def _warm(self) -> None:
+        i = 0
+        while i < len(self.nodes):
+            try:
+                if self.table[i] is None:
+                    self.action(i, END_SYMBOL)
+                for symbol in list(self._pending[i]):
+                    self.action(i, symbol)
+            except NotLR1Grammar:
+                pass
+            i += 1
+
+    def _build_row(self, i: int) -> None:
+        shift_symbols = {conf.rule.right[conf.point_position] for conf in self.nodes[i].confs
+                         if len(conf.rule.right) > conf.point_position}
+        pending = set(shift_symbols)
+        row = {}
+        reduced = set()
+        for conf in self.nodes[i].confs:
+            if len(conf.rule.right) == conf.point_position:
+                if conf.next_symbol in reduced:
+                    self.conflicts.append((i, conf.next_symbol))
+                    raise NotLR1Grammar(i, conf.next_symbol)
+                reduced.add(conf.next_symbol)
+                if conf.next_symbol in shift_symbols:
+                    resolution = self._resolve(i, conf.next_symbol, conf.rule)
+                    if resolution == 'shift':
+                        continue
+                    pending.discard(conf.next_symbol)
+                    if resolution == 'error':
+                        row[conf.next_symbol] = None
+                        continue
+                row[conf.next_symbol] = self.Reduce(conf.rule)
+        self._pending[i] = frozenset(pending)
+        self.table[i] = row
+        if self.stats is not None:
+            self.stats.add('lazy_rows')
 
     def fill_table(self, i: int, used: Set[int]) -> None:
         if i in used:
@@ -175,55 +431,51 @@ class LR:
         for symbol in self.nodes[i].children:
             self.table[i][symbol] = self.Shift(self.nodes[i].children[symbol])
 
+        reduced = set()
         for conf in self.nodes[i].confs:
             if len(conf.rule.right) == conf.point_position:
+                if ((conf.next_symbol in reduced) or
+                        (conf.next_symbol in self.table[i] and
+                         not isinstance(self.table[i][conf.next_symbol], self.Shift))):
+                    self.conflicts.append((i, conf.next_symbol))
+                    raise NotLR1Grammar(i, conf.next_symbol)
+                reduced.add(conf.next_symbol)
                 if conf.next_symbol in self.table[i]:
-                    raise Exception('Not LR(1) grammar')
+                    resolution = self._resolve(i, conf.next_symbol, conf.rule)
+                    if resolution == 'shift':
+                        continue
+                    if resolution == 'error':
+                        self.table[i][conf.next_symbol] = None
+                        continue
                 self.table[i][conf.next_symbol] = self.Reduce(conf.rule)
         used.add(i)
         for symbol in self.nodes[i].children:
             self.fill_table(self.nodes[i].children[symbol], used)
 
-    def first(self, w: str, current_opened: Set[str]) -> Set[str]:
-        if w in current_opened:
-            return set()
-        current_opened.add(w)
-        if len(w) == 0:
-            return set()
-        result = [w[0]]
-        result_set = {w[0]}
-        if self.grammar.is_terminal(w):
-            return result_set
-        changed = True
-        while changed:
-            changed = False
-            u_index = 0
-            while u_index < len(result):
-                alpha = result[u_index]
-                if self.grammar.is_terminal(alpha):
-                    break
-                changed = changed or self._add_non_terminal_first(alpha, result, result_set)
-                u_index += 1
-
-        if '' in result_set:
-            result_set.remove('')
-            result_set.update(self.first(w[1:], current_opened))
-        return result_set
-
-    def _add_non_terminal_first(self, alpha: str, result: List[str], result_set: Set[str]) -> bool:
-        changed = False
-        for rule in self.grammar.rules():
-            if rule.left != alpha:
-                continue
-            if alpha in result_set:
-                changed = True
-                result_set.discard(alpha)
-            if ((alpha != rule.right[:1]) and
-                    (rule.right[:1] not in result_set)):
-                changed = True
-                result_set.add(rule.right[:1])
-                result.append(rule.right[:1])
-        return changed
+    def _resolve(self, i: int, symbol: str, rule: Rule) -> str:
+        rule_precedence = self.grammar.rule_precedence(rule)
+        symbol_precedence = self.grammar.precedence.get(symbol)
+        if rule_precedence is None or symbol_precedence is None:
+            self.conflicts.append((i, symbol))
+            raise NotLR1Grammar(i, symbol)
+        if self.stats is not None:
+            self.stats.add('resolved_conflicts')
+        if rule_precedence[0] != symbol_precedence[0]:
+            return 'reduce' if rule_precedence[0] > symbol_precedence[0] else 'shift'
+        return {'left': 'reduce', 'right': 'shift', 'nonassoc': 'error'}[symbol_precedence[1]]
+
+    def first(self, w: str) -> Set[str]:
+        if self.stats is not None:
+            self.stats.add('first_calls')
+        result = set()
+        for letter in w:
+            if letter in self.grammar.terms or letter not in self.first_sets:
+                result.add(letter)
+                return result
+            result |= self.first_sets[letter]
+            if letter not in self.nullable:
+                return result
+        return result
 
 
 if __name__ == '__main__':
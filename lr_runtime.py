@@ -0,0 +1,273 @@
+from __future__ import annotations
+import mmap
+import struct
+import sys
+from array import array
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Optional, Tuple, Union
+
+from utils import Word, as_codes
+from lr import LR, NotLR1Grammar, REAL_START, END_SYMBOL
+
+
+MAGIC = b'LRT2'
+HEADER = struct.Struct('<4s7i')
+DENSE = 0
+COMPRESSED = 1
+
+
+def table_memory(lr: LR) -> int:
+    result = sys.getsizeof(lr.table)
+    actions = {}
+    for row in lr.table:
+        result += sys.getsizeof(row)
+        for action in row.values():
+            if action is not None:
+                actions[id(action)] = action
+    for action in actions.values():
+        result += sys.getsizeof(action) + sys.getsizeof(action.__dict__)
+    return result
+
+
+class LRRuntime:
+    def __init__(self, buffer: Union[bytes, bytearray, memoryview, mmap.mmap],
+                 owner: Optional[object] = None) -> LRRuntime:
+        self._owner = owner
+        self._buffer = memoryview(buffer)
+        (magic, layout, states_count, symbols_count, rules_count, symbols_size,
+         rows_count, slots_count) = HEADER.unpack_from(self._buffer, 0)
+        if magic != MAGIC:
+            raise Exception('Wrong table format')
+        offset = HEADER.size
+        symbols = bytes(self._buffer[offset:offset + symbols_size]).decode('utf-8')
+        offset += symbols_size + (-symbols_size % 4)
+        self.compressed = layout == COMPRESSED
+        self.states_count = states_count
+        self.symbols_count = symbols_count
+        self.columns = {symbol: column for column, symbol in enumerate(symbols)}
+        self.code_columns = {ord(symbol): column for symbol, column in self.columns.items()}
+        self._views = []
+        self.rules, offset = self._view(offset, rules_count * 2)
+        if self.compressed:
+            self.row_of, offset = self._view(offset, states_count)
+            self.default, offset = self._view(offset, rows_count)
+            self.base, offset = self._view(offset, rows_count)
+            self.check, offset = self._view(offset, slots_count)
+            self.value, offset = self._view(offset, slots_count)
+        else:
+            self.table, offset = self._view(offset, states_count * symbols_count)
+
+    def _view(self, offset: int, count: int) -> Tuple[memoryview, int]:
+        view = self._buffer[offset:offset + count * 4].cast('i')
+        self._views.append(view)
+        return view, offset + count * 4
+
+    @property
+    def nbytes(self) -> int:
+        return self._buffer.nbytes
+
+    @classmethod
+    def from_lr(cls, lr: LR, compress: bool = False) -> LRRuntime:
+        return cls(cls.compile(lr, compress))
+
+    @classmethod
+    def load(cls, path: str) -> LRRuntime:
+        with open(path, 'rb') as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped, mapped)
+
+    @classmethod
+    def attach(cls, name: str) -> LRRuntime:
+        if sys.version_info >= (3, 13):
+            block = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            block = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(block._name, 'shared_memory')
+        return cls(block.buf, block)
+
+    @staticmethod
+    def compile(lr: LR, compress: bool = False) -> bytes:
+        if lr.lazy:
+            lr.warm()
+        if None in lr.table:
+            raise NotLR1Grammar(*lr.conflicts[0])
+        symbols = sorted(lr.grammar.terms | {END_SYMBOL}) + sorted(lr.grammar.nonterms)
+        columns = {symbol: column for column, symbol in enumerate(symbols)}
+        rules = []
+        rule_index = {}
+        rows = []
+        for row in lr.table:
+            encoded_row = {}
+            for symbol, action in row.items():
+                if action is None:
+                    encoded_row[columns[symbol]] = 0
+                    continue
+                if isinstance(action, LR.Shift):
+                    encoded_row[columns[symbol]] = action.to + 1
+                    continue
+                if action.rule not in rule_index:
+                    rule_index[action.rule] = len(rules) // 2
+                    left = -1 if action.rule.left == REAL_START else columns[action.rule.left]
+                    rules.extend((left, len(action.rule.right)))
+                encoded_row[columns[symbol]] = -rule_index[action.rule] - 1
+            rows.append(encoded_row)
+
+        layout = DENSE
+        table = array('i', bytes(4 * len(rows) * len(symbols)))
+        for state, row in enumerate(rows):
+            for column, action in row.items():
+                table[state * len(symbols) + column] = action
+        sections = [table]
+        if compress:
+            compressed = LRRuntime._compress(rows, rules, len(symbols))
+            if sum(len(section) for section in compressed) < len(table):
+                layout = COMPRESSED
+                sections = compressed
+
+        encoded_symbols = ''.join(symbols).encode('utf-8')
+        rows_count = len(sections[2]) if layout == COMPRESSED else 0
+        slots_count = len(sections[3]) if layout == COMPRESSED else 0
+        return b''.join([
+            HEADER.pack(MAGIC, layout, len(rows), len(symbols), len(rules) // 2,
+                        len(encoded_symbols), rows_count, slots_count),
+            encoded_symbols,
+            bytes(-len(encoded_symbols) % 4),
+            array('i', rules).tobytes(),
+        ] + [section.tobytes() for section in sections])
+
+    @staticmethod
+    def _compress(rows: List[Dict[int, int]], rules: List[int],
+                  symbols_count: int) -> List[array]:
+        row_of = array('i')
+        unique_rows = {}
+        for row in rows:
+            reduces = [action for action in row.values()
+                       if action < 0 and rules[-2 * action - 2] >= 0]
+            default = max(set(reduces), key=reduces.count) if reduces else 0
+            key = (default, tuple(sorted((column, action) for column, action in row.items()
+                                         if action != default)))
+            if key not in unique_rows:
+                unique_rows[key] = len(unique_rows)
+            row_of.append(unique_rows[key])
+
+        default = array('i', [0] * len(unique_rows))
+        base = array('i', [0] * len(unique_rows))
+        check = array('i')
+        value = array('i')
+        for (row_default, entries), row in sorted(unique_rows.items(),
+                                                  key=lambda item: -len(item[0][1])):
+            default[row] = row_default
+            row_base = 0
+            while any(row_base + column < len(check) and check[row_base + column] != -1
+                      for column, _ in entries):
+                row_base += 1
+            base[row] = row_base
+            if len(check) < row_base + symbols_count:
+                check.extend([-1] * (row_base + symbols_count - len(check)))
+                value.extend([0] * (row_base + symbols_count - len(value)))
+            for column, action in entries:
+                check[row_base + column] = row
+                value[row_base + column] = action
+        return [row_of, default, base, check, value]
+
+    def to_bytes(self) -> bytes:
+        return bytes(self._buffer)
+
+    def save(self, path: str) -> None:
+        with open(path, 'wb') as file:
+            file.write(self._buffer)
+
+    def to_shared_memory(self, name: Optional[str] = None) -> shared_memory.SharedMemory:
+        block = shared_memory.SharedMemory(name=name, create=True, size=len(self._buffer))
+        block.buf[:len(self._buffer)] = self._buffer
+        return block
+
+    def close(self) -> None:
+        for view in self._views:
+            view.release()
+        self._buffer.release()
+        if self._owner is not None:
+            self._owner.close()
+            self._owner = None
+
+    def action(self, state: int, column: int) -> int:
+        if not self.compressed:
+            return self.table[state * self.symbols_count + column]
+        row = self.row_of[state]
+        slot = self.base[row] + column
+        if self.check[slot] == row:
+            return self.value[slot]
+        return self.default[row]
+
+    def predict(self, word: Word) -> bool:
+        if not isinstance(word, str):
+            word = as_codes(word)
+        if self.compressed:
+            return self._predict_compressed(word)
+        table = self.table
+        rules = self.rules
+        columns = self.columns if isinstance(word, str) else self.code_columns
+        symbols_count = self.symbols_count
+        end = self.columns[END_SYMBOL]
+        stack = [0]
+        i = 0
+        while True:
+            column = columns.get(word[i]) if i < len(word) else end
+            if column is None:
+                return False
+            action = table[stack[-1] * symbols_count + column]
+            if action > 0:
+                stack.append(action - 1)
+                i += 1
+            elif action < 0:
+                left = rules[-2 * action - 2]
+                rule_len = rules[-2 * action - 1]
+                if left < 0:
+                    return i == len(word)
+                if rule_len >= len(stack):
+                    return False
+                del stack[len(stack) - rule_len:]
+                action = table[stack[-1] * symbols_count + left]
+                if action <= 0:
+                    return False
+                stack.append(action - 1)
+            else:
+                return False
+
+    def _predict_compressed(self, word: Word) -> bool:
+        rules = self.rules
+        columns = self.columns if isinstance(word, str) else self.code_columns
+        row_of = self.row_of
+        default = self.default
+        base = self.base
+        check = self.check
+        value = self.value
+        end = self.columns[END_SYMBOL]
+        stack = [0]
+        i = 0
+        while True:
+            column = columns.get(word[i]) if i < len(word) else end
+            if column is None:
+                return False
+            row = row_of[stack[-1]]
+            slot = base[row] + column
+            action = value[slot] if check[slot] == row else default[row]
+            if action > 0:
+                stack.append(action - 1)
+                i += 1
+            elif action < 0:
+                left = rules[-2 * action - 2]
+                rule_len = rules[-2 * action - 1]
+                if left < 0:
+                    return i == len(word)
+                if rule_len >= len(stack):
+                    return False
+                del stack[len(stack) - rule_len:]
+                row = row_of[stack[-1]]
+                slot = base[row] + left
+                action = value[slot] if check[slot] == row else default[row]
+                if action <= 0:
+                    return False
+                stack.append(action - 1)
+            else:
+                return False
@@ -0,0 +1,91 @@
+from __future__ import annotations
+from typing import Optional, Union
+
+from utils import Rule, Grammar, Word
+from checker import check
+from stats import Stats
+from regular import DFA, is_right_linear
+from practical_earley import PracticalEarley
+from lr import LR, NotLR1Grammar
+
+
+class Parser:
+    def __init__(self, collect_stats: bool = False) -> Parser:
+        self.collect_stats = collect_stats
+        self.grammar = None
+        self.engine = None
+        self.engine_name = None
+        self.reason = None
+        self.stale = False
+        self.stats = None
+
+    def fit(self, grammar: Grammar) -> None:
+        self.detach()
+        self.engine = None
+        self.engine_name = None
+        self.grammar = grammar
+        grammar.subscribe(self._on_change)
+        self._select()
+
+    def detach(self) -> None:
+        if self.grammar is not None:
+            self.grammar.unsubscribe(self._on_change)
+        if isinstance(self.engine, LR):
+            self.engine.detach()
+
+    def _on_change(self, rule: Optional[Rule], added: bool) -> None:
+        self.stale = True
+
+    def _select(self) -> None:
+        self.stale = False
+        dfa = None if self.grammar.precedence else DFA.from_grammar(self.grammar)
+        if dfa is not None:
+            linear = 'right' if is_right_linear(self.grammar) else 'left'
+            self._use(dfa, 'dfa', f'grammar is {linear}-linear',
+                      Stats('dfa') if self.collect_stats else None)
+            return
+        if self.engine_name == 'lr':
+            lr = self.engine
+        else:
+            lr = LR(collect_stats=self.collect_stats, use_dfa=False)
+        try:
+            if lr is self.engine:
+                lr.refit()
+            else:
+                lr.fit(self.grammar)
+        except NotLR1Grammar as e:
+            lr.detach()
+            general = PracticalEarley(collect_stats=self.collect_stats)
+            general.fit(self.grammar)
+            self._use(general, 'practical_earley',
+                      f'not LR(1): conflict in state {e.state} on {e.symbol!r}', general.stats)
+            return
+        self._use(lr, 'lr', f'grammar is LR(1) with {len(lr.table)} states', lr.stats)
+
+    def _use(self, engine: Union[DFA, LR, PracticalEarley], name: str, reason: str,
+             stats: Optional[Stats]) -> None:
+        if isinstance(self.engine, LR) and self.engine is not engine:
+            self.engine.detach()
+        self.engine = engine
+        self.engine_name = name
+        self.reason = reason
+        self.stats = stats
+
+    def refit(self) -> None:
+        if not self.stale:
+            return
+        self._select()
+
+    def predict(self, word: Word, max_items: Optional[int] = None,
+                deadline: Optional[float] = None) -> bool:
+        if self.stale:
+            self.refit()
+        if self.engine_name == 'dfa':
+            if self.stats is not None:
+                self.stats.add('dfa_words')
+            return self.engine.predict(word)
+        return self.engine.predict(word, max_items, deadline)
+
+
+if __name__ == '__main__':
+    check()
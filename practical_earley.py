@@ -0,0 +1,171 @@
+from __future__ import annotations
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from utils import Rule, Grammar, Word, Budget, as_symbols, symbol_codes
+from checker import check
+from lr import LR, REAL_START
+from stats import Stats
+
+
+State = FrozenSet[LR.Configuration]
+
+
+class PracticalEarley:
+    def __init__(self, collect_stats: bool = False) -> PracticalEarley:
+        self.grammar = None
+        self.symbols = None
+        self.states = None
+        self.kernel = None
+        self.goto = None
+        self.epsilon = None
+        self.completed = None
+        self.accepting = None
+        self.stats = Stats('practical_earley') if collect_stats else None
+
+    def fit(self, grammar: Grammar) -> None:
+        self.grammar = grammar
+        self.symbols = symbol_codes(grammar.terms)
+        self._nullable = grammar.nullable()
+        self._rules_by_left = grammar.rules_by_left()
+        self.states = []
+        self.kernel = []
+        self.goto = []
+        self.epsilon = []
+        self.completed = []
+        self.accepting = []
+        index = {}
+        start = self._kernel({LR.Configuration(Rule(REAL_START, grammar.start), '', 0)})
+        self._add_state(start, index)
+        i = 0
+        while i < len(self.states):
+            if self.kernel[i]:
+                nonkernel = self._nonkernel(self.states[i])
+                if nonkernel:
+                    self.epsilon[i] = self._add_state(nonkernel, index, kernel=False)
+            symbols = {conf.rule.right[conf.point_position] for conf in self.states[i]
+                       if len(conf.rule.right) > conf.point_position}
+            for symbol in symbols:
+                self.goto[i][symbol] = self._add_state(self._goto(self.states[i], symbol), index)
+            i += 1
+        if self.stats is not None:
+            self.stats.reset()
+            self.stats.counters['states'] = len(self.states)
+
+    def predict(self, word: Word, max_items: Optional[int] = None,
+                deadline: Optional[float] = None) -> bool:
+        word = as_symbols(word, self.symbols)
+        S = [[] for _ in range(len(word) + 1)]
+        S_sets = [set() for _ in range(len(word) + 1)]
+        waiting = []
+        stats = self.stats
+        if stats is not None:
+            stats.columns = []
+            stats.add('words')
+        budget = None
+        if max_items is not None or deadline is not None:
+            budget = Budget(max_items, deadline, stats)
+        self._add(S, S_sets, 0, 0, 0)
+        for i in range(len(word) + 1):
+            column = S[i]
+            scanned = completed = 0
+            item_index = 0
+            while item_index < len(column):
+                state, origin = column[item_index]
+                if i < len(word):
+                    to = self.goto[state].get(word[i])
+                    if to is not None:
+                        self._add(S, S_sets, i + 1, to, origin)
+                        scanned += 1
+                if origin != i:
+                    for nonterm in self.completed[state]:
+                        for to, parent_origin in waiting[origin].get(nonterm, ()):
+                            self._add(S, S_sets, i, to, parent_origin)
+                            completed += 1
+                item_index += 1
+                if budget is not None:
+                    budget.spend(i)
+            waiting.append(self._waiting(column))
+            if stats is not None:
+                stats.column(items=len(column), scan=scanned, complete=completed)
+                stats.add('items', len(column))
+                stats.add('scan', scanned)
+                stats.add('complete', completed)
+        return any(self.accepting[state] for state, origin in S[len(word)] if origin == 0)
+
+    def _add(self, S: List[List[Tuple[int, int]]], S_sets: List[Set[Tuple[int, int]]],
+             i: int, state: int, origin: int) -> None:
+        if (state, origin) in S_sets[i]:
+            return
+        S_sets[i].add((state, origin))
+        S[i].append((state, origin))
+        nonkernel = self.epsilon[state]
+        if nonkernel is not None and (nonkernel, i) not in S_sets[i]:
+            S_sets[i].add((nonkernel, i))
+            S[i].append((nonkernel, i))
+
+    def _waiting(self, column: List[Tuple[int, int]]) -> Dict[str, List[Tuple[int, int]]]:
+        result = {}
+        for state, origin in column:
+            for symbol, to in self.goto[state].items():
+                if symbol not in self.grammar.terms:
+                    result.setdefault(symbol, []).append((to, origin))
+        return result
+
+    def _add_state(self, state: State, index: Dict[Tuple[bool, State], int],
+                   kernel: bool = True) -> int:
+        if (kernel, state) in index:
+            return index[(kernel, state)]
+        index[(kernel, state)] = len(self.states)
+        self.states.append(state)
+        self.kernel.append(kernel)
+        self.goto.append({})
+        self.epsilon.append(None)
+        self.completed.append({conf.rule.left for conf in state
+                               if len(conf.rule.right) == conf.point_position})
+        self.accepting.append(any(conf.rule.left == REAL_START and
+                                  len(conf.rule.right) == conf.point_position
+                                  for conf in state))
+        return index[(kernel, state)]
+
+    def _advance_nullable(self, confs: Set[LR.Configuration]) -> Set[LR.Configuration]:
+        result = set(confs)
+        opened = list(confs)
+        while opened:
+            conf = opened.pop()
+            if ((len(conf.rule.right) > conf.point_position) and
+                    (conf.rule.right[conf.point_position] in self._nullable)):
+                adding_conf = LR.Configuration(conf.rule, '', conf.point_position + 1)
+                if adding_conf not in result:
+                    result.add(adding_conf)
+                    opened.append(adding_conf)
+        return result
+
+    def _kernel(self, confs: Set[LR.Configuration]) -> State:
+        return frozenset(self._advance_nullable(confs))
+
+    def _nonkernel(self, state: State) -> State:
+        result = set()
+        opened = [conf.rule.right[conf.point_position] for conf in state
+                  if len(conf.rule.right) > conf.point_position]
+        used = set()
+        while opened:
+            nonterm = opened.pop()
+            if nonterm in used or nonterm in self.grammar.terms:
+                continue
+            used.add(nonterm)
+            for rule in self._rules_by_left.get(nonterm, []):
+                for conf in self._advance_nullable({LR.Configuration(rule, '', 0)}):
+                    result.add(conf)
+                    if len(rule.right) > conf.point_position:
+                        opened.append(rule.right[conf.point_position])
+        return frozenset(result)
+
+    def _goto(self, state: State, symbol: str) -> State:
+        return self._kernel({LR.Configuration(conf.rule, '', conf.point_position + 1)
+                             for conf in state
+                             if ((len(conf.rule.right) > conf.point_position) and
+                                 (conf.rule.right[conf.point_position] == symbol))})
+
+
+if __name__ == '__main__':
+    check(PracticalEarley())
@@ -0,0 +1,199 @@
+from __future__ import annotations
+from itertools import islice
+from typing import Dict, Optional, Set, Tuple
+
+from utils import Grammar, Word, as_codes
+
+
+FILTERS = ['length', 'parity', 'alphabet', 'first', 'last', 'bigram']
+
+
+class Prefilter:
+    def __init__(self, grammar: Grammar, known: Optional[Prefilter] = None) -> Prefilter:
+        self.grammar = grammar
+        self.checked = 0
+        self.hits = {name: 0 for name in FILTERS}
+        rules = self._useful_rules(known)
+        nonterms = {rule.left for rule in rules}
+        self._lengths = self._min_length(rules, nonterms,
+                                         None if known is None else known._lengths)
+        self.min_length = self._lengths.get(grammar.start)
+        self.nullable = self.min_length == 0
+        self._sets = self._analyse(rules, nonterms, None if known is None else known._sets)
+        first, last, bigrams, terms = self._sets
+        self.terms = terms.get(grammar.start, set())
+        self.first = first.get(grammar.start, set())
+        self.last = last.get(grammar.start, set())
+        self.bigrams = bigrams.get(grammar.start, set())
+        self._parity_sets = self._parities(rules, nonterms,
+                                           None if known is None else known._parity_sets)
+        parities = self._parity_sets.get(grammar.start, set())
+        self.parity = next(iter(parities)) if len(parities) == 1 else None
+        self._delete_terms = dict.fromkeys(map(ord, self.terms))
+        self._delete_bytes = bytes(code for code in map(ord, self.terms) if code < 256)
+        self._first_codes = set(map(ord, self.first))
+        self._last_codes = set(map(ord, self.last))
+        self._bigram_codes = {(ord(a), ord(b)) for a, b in self.bigrams}
+        self._forbidden = [a + b for a in sorted(self.terms) for b in sorted(self.terms)
+                           if (a, b) not in self.bigrams]
+        self._forbidden_bytes = [pair.encode('latin-1') for pair in self._forbidden
+                                 if all(ord(letter) < 256 for letter in pair)]
+
+    def accepts(self, word: Word) -> bool:
+        self.checked += 1
+        if self.min_length is None or len(word) < self.min_length:
+            self.hits['length'] += 1
+            return False
+        if self.parity is not None and len(word) % 2 != self.parity:
+            self.hits['parity'] += 1
+            return False
+        if not word:
+            return True
+        if isinstance(word, str):
+            return self._accepts_str(word)
+        return self._accepts_codes(as_codes(word))
+
+    def stats(self) -> Dict[str, int]:
+        result = {'checked': self.checked}
+        result.update(self.hits)
+        return result
+
+    def _accepts_str(self, word: str) -> bool:
+        if word.translate(self._delete_terms):
+            self.hits['alphabet'] += 1
+            return False
+        if word[0] not in self.first:
+            self.hits['first'] += 1
+            return False
+        if word[-1] not in self.last:
+            self.hits['last'] += 1
+            return False
+        if any(pair in word for pair in self._forbidden):
+            self.hits['bigram'] += 1
+            return False
+        return True
+
+    def _accepts_codes(self, word: Word) -> bool:
+        if isinstance(word, (bytes, bytearray)):
+            alphabet_ok = not word.translate(None, self._delete_bytes)
+        else:
+            alphabet_ok = set(word).issubset(self._first_codes | self._last_codes |
+                                             {code for pair in self._bigram_codes
+                                              for code in pair})
+        if not alphabet_ok:
+            self.hits['alphabet'] += 1
+            return False
+        if word[0] not in self._first_codes:
+            self.hits['first'] += 1
+            return False
+        if word[-1] not in self._last_codes:
+            self.hits['last'] += 1
+            return False
+        if isinstance(word, (bytes, bytearray)):
+            bigrams_ok = not any(pair in word for pair in self._forbidden_bytes)
+        else:
+            bigrams_ok = set(zip(word, islice(word, 1, None))).issubset(self._bigram_codes)
+        if not bigrams_ok:
+            self.hits['bigram'] += 1
+            return False
+        return True
+
+    def _useful_rules(self, known: Optional[Prefilter]) -> Set:
+        productive = set() if known is None else set(known._productive)
+        changed = True
+        while changed:
+            changed = False
+            for rule in self.grammar.rules():
+                if ((rule.left not in productive) and
+                        all(letter in productive or letter in self.grammar.terms
+                            for letter in rule.right)):
+                    productive.add(rule.left)
+                    changed = True
+        rules = {rule for rule in self.grammar.rules()
+                 if all(letter in productive or letter in self.grammar.terms
+                        for letter in rule.right)}
+        reachable = {self.grammar.start}
+        if known is not None:
+            reachable |= known._reachable
+        changed = True
+        while changed:
+            changed = False
+            for rule in rules:
+                if rule.left in reachable:
+                    for letter in rule.right:
+                        if letter not in self.grammar.terms and letter not in reachable:
+                            reachable.add(letter)
+                            changed = True
+        self._productive = productive
+        self._reachable = reachable
+        return {rule for rule in rules if rule.left in reachable}
+
+    def _min_length(self, rules: Set, nonterms: Set[str],
+                    known: Optional[Dict[str, int]]) -> Dict[str, int]:
+        result = {} if known is None else dict(known)
+        changed = True
+        while changed:
+            changed = False
+            for rule in rules:
+                if any(letter in nonterms and letter not in result for letter in rule.right):
+                    continue
+                length = sum(1 if letter in self.grammar.terms else result[letter]
+                             for letter in rule.right)
+                if rule.left not in result or length < result[rule.left]:
+                    result[rule.left] = length
+                    changed = True
+        return result
+
+    def _analyse(self, rules: Set, nonterms: Set[str],
+                 known: Optional[Tuple[Dict, Dict, Dict, Dict]]) -> Tuple[Dict, Dict, Dict, Dict]:
+        nullable = {nonterm for nonterm, length in self._lengths.items() if length == 0}
+        first, last, bigrams, terms = [{nonterm: set(sets.get(nonterm, ())) for nonterm in nonterms}
+                                       for sets in known or ({}, {}, {}, {})]
+
+        def of(sets: Dict[str, Set], letter: str) -> Set:
+            return {letter} if letter in self.grammar.terms else sets[letter]
+
+        changed = True
+        while changed:
+            changed = False
+            for rule in rules:
+                size = (len(first[rule.left]), len(last[rule.left]),
+                        len(bigrams[rule.left]), len(terms[rule.left]))
+                for letter in rule.right:
+                    first[rule.left] |= of(first, letter)
+                    if letter not in nullable:
+                        break
+                for letter in reversed(rule.right):
+                    last[rule.left] |= of(last, letter)
+                    if letter not in nullable:
+                        break
+                ends = set()
+                for letter in rule.right:
+                    terms[rule.left] |= of(terms, letter)
+                    if letter not in self.grammar.terms:
+                        bigrams[rule.left] |= bigrams[letter]
+                    bigrams[rule.left] |= {(a, b) for a in ends for b in of(first, letter)}
+                    if letter in nullable:
+                        ends |= of(last, letter)
+                    else:
+                        ends = set(of(last, letter))
+                if size != (len(first[rule.left]), len(last[rule.left]),
+                            len(bigrams[rule.left]), len(terms[rule.left])):
+                    changed = True
+        return first, last, bigrams, terms
+
+    def _parities(self, rules: Set, nonterms: Set[str],
+                  known: Optional[Dict[str, Set[int]]]) -> Dict[str, Set[int]]:
+        result = {nonterm: set((known or {}).get(nonterm, ())) for nonterm in nonterms}
+        changed = True
+        while changed:
+            changed = False
+            for rule in rules:
+                current = {0}
+                for letter in rule.right:
+                    options = {1} if letter in self.grammar.terms else result[letter]
+                    current = {(a + b) % 2 for a in current for b in options}
+                if not current.issubset(result[rule.left]):
+                    result[rule.left] |= current
+                    changed = True
+        return result
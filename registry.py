@@ -0,0 +1,104 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import pickle
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Union
+
+from utils import Grammar
+from earley import Earley
+from lr import LR
+
+
+Parser = Union[Earley, LR]
+
+
+def grammar_key(grammar: Grammar) -> str:
+    fields = {
+        'nonterms': sorted(grammar.nonterms),
+        'terms': sorted(grammar.terms),
+        'start': grammar.start,
+        'rules': sorted([rule.left, rule.right] for rule in grammar.rules()),
+    }
+    if grammar.precedence:
+        fields['precedence'] = sorted([term, *value] for term, value in grammar.precedence.items())
+    canonical = json.dumps(fields, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ParserRegistry:
+    def __init__(self, factory: Callable[[], Parser] = Earley, max_entries: int = 128,
+                 max_bytes: Optional[int] = None, disk_dir: Optional[str] = None) -> ParserRegistry:
+        self.factory = factory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self.size = 0
+        self._entries = OrderedDict()
+        if disk_dir is not None:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, grammar: Grammar) -> bool:
+        return grammar_key(grammar) in self._entries
+
+    def get(self, grammar: Grammar) -> Parser:
+        key = grammar_key(grammar)
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+        self.misses += 1
+        parser = self._load(key)
+        if parser is None:
+            parser = self.factory()
+            parser.fit(grammar.copy())
+        else:
+            self.disk_hits += 1
+        self._insert(key, parser)
+        return parser
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'entries': len(self._entries),
+            'bytes': self.size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'disk_hits': self.disk_hits,
+            'evictions': self.evictions,
+        }
+
+    def _insert(self, key: str, parser: Parser) -> None:
+        data = pickle.dumps(parser, pickle.HIGHEST_PROTOCOL)
+        self._entries[key] = (parser, len(data))
+        self.size += len(data)
+        if self.disk_dir is not None and not os.path.exists(self._path(key)):
+            with open(self._path(key), 'wb') as file:
+                file.write(data)
+        while len(self._entries) > 1 and (
+                len(self._entries) > self.max_entries or
+                (self.max_bytes is not None and self.size > self.max_bytes)):
+            _, (_, size) = self._entries.popitem(last=False)
+            self.size -= size
+            self.evictions += 1
+
+    def _load(self, key: str) -> Optional[Parser]:
+        if self.disk_dir is None or not os.path.exists(self._path(key)):
+            return None
+        with open(self._path(key), 'rb') as file:
+            return pickle.load(file)
+
+    def _path(self, key: str) -> str:
+        name = getattr(self.factory, '__name__', type(self.factory).__name__)
+        return os.path.join(self.disk_dir, f'{name}-{key}.pickle')
@@ -0,0 +1,189 @@
+from __future__ import annotations
+from array import array
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from utils import Grammar, Word, as_codes
+
+
+def _is_terminal_string(grammar: Grammar, w: str) -> bool:
+    return all(letter in grammar.terms for letter in w)
+
+
+def is_right_linear(grammar: Grammar) -> bool:
+    for rule in grammar.rules():
+        right = rule.right
+        if right and right[-1] not in grammar.terms:
+            right = right[:-1]
+        if not _is_terminal_string(grammar, right):
+            return False
+    return True
+
+
+def is_left_linear(grammar: Grammar) -> bool:
+    for rule in grammar.rules():
+        right = rule.right
+        if right and right[0] not in grammar.terms:
+            right = right[1:]
+        if not _is_terminal_string(grammar, right):
+            return False
+    return True
+
+
+class DFA:
+    MAX_STATES = 1024
+
+    def __init__(self, symbols: List[str], table: array, accepting: bytearray,
+                 start: int) -> DFA:
+        self.symbols = symbols
+        self.table = table
+        self.accepting = accepting
+        self.start = start
+        self.columns = {symbol: column for column, symbol in enumerate(symbols)}
+        self.code_columns = {ord(symbol): column for column, symbol in enumerate(symbols)}
+
+    @property
+    def states_count(self) -> int:
+        return len(self.accepting)
+
+    @classmethod
+    def from_grammar(cls, grammar: Grammar, max_states: Optional[int] = None) -> Optional[DFA]:
+        if is_right_linear(grammar):
+            edges, start, final = cls._right_linear_nfa(grammar)
+        elif is_left_linear(grammar):
+            edges, start, final = cls._left_linear_nfa(grammar)
+        else:
+            return None
+        max_states = cls.MAX_STATES if max_states is None else max_states
+        determinised = cls._determinise(edges, start, final, sorted(grammar.terms), max_states)
+        if determinised is None:
+            return None
+        return cls._minimise(*determinised)
+
+    @staticmethod
+    def _add_path(edges: Dict[object, List[Tuple[str, object]]], source: object, w: str,
+                  target: object) -> None:
+        for position, letter in enumerate(w[:-1]):
+            middle = (source, w, target, position)
+            edges.setdefault(source, []).append((letter, middle))
+            source = middle
+        edges.setdefault(source, []).append((w[-1:], target))
+
+    @classmethod
+    def _right_linear_nfa(cls, grammar: Grammar) -> Tuple[Dict, object, object]:
+        edges = {}
+        final = ('final',)
+        for rule in grammar.rules():
+            if rule.right and rule.right[-1] not in grammar.terms:
+                cls._add_path(edges, rule.left, rule.right[:-1], rule.right[-1])
+            else:
+                cls._add_path(edges, rule.left, rule.right, final)
+        return edges, grammar.start, final
+
+    @classmethod
+    def _left_linear_nfa(cls, grammar: Grammar) -> Tuple[Dict, object, object]:
+        edges = {}
+        start = ('start',)
+        for rule in grammar.rules():
+            if rule.right and rule.right[0] not in grammar.terms:
+                cls._add_path(edges, rule.right[0], rule.right[1:], rule.left)
+            else:
+                cls._add_path(edges, start, rule.right, rule.left)
+        return edges, start, grammar.start
+
+    @staticmethod
+    def _epsilon_closure(edges: Dict, states: Iterable[object]) -> FrozenSet[object]:
+        result = set(states)
+        opened = list(result)
+        while opened:
+            for letter, target in edges.get(opened.pop(), []):
+                if letter == '' and target not in result:
+                    result.add(target)
+                    opened.append(target)
+        return frozenset(result)
+
+    @classmethod
+    def _determinise(cls, edges: Dict, start: object, final: object, symbols: List[str],
+                     max_states: int) -> Optional[Tuple[List[str], List[List[int]], List[bool]]]:
+        first = cls._epsilon_closure(edges, [start])
+        index = {first: 0}
+        subsets = [first]
+        transitions = []
+        i = 0
+        while i < len(subsets):
+            row = []
+            for symbol in symbols:
+                targets = cls._epsilon_closure(edges, [target for state in subsets[i]
+                                                       for letter, target in edges.get(state, [])
+                                                       if letter == symbol])
+                if targets not in index:
+                    if len(subsets) >= max_states:
+                        return None
+                    index[targets] = len(subsets)
+                    subsets.append(targets)
+                row.append(index[targets])
+            transitions.append(row)
+            i += 1
+        return symbols, transitions, [final in subset for subset in subsets]
+
+    @classmethod
+    def _minimise(cls, symbols: List[str], transitions: List[List[int]],
+                  accepting: List[bool]) -> DFA:
+        live = set(state for state, is_accepting in enumerate(accepting) if is_accepting)
+        changed = True
+        while changed:
+            changed = False
+            for state, row in enumerate(transitions):
+                if state not in live and any(target in live for target in row):
+                    live.add(state)
+                    changed = True
+
+        classes = [(accepting[state] if state in live else None) for state in range(len(accepting))]
+        while True:
+            signatures = {}
+            new_classes = []
+            for state, row in enumerate(transitions):
+                signature = (classes[state], tuple(classes[target] for target in row))
+                new_classes.append(signatures.setdefault(signature, len(signatures)))
+            if len(signatures) == len(set(classes)):
+                break
+            classes = new_classes
+        classes = new_classes
+
+        dead = {classes[state] for state in range(len(accepting)) if state not in live}
+        numbers = {}
+        for state in range(len(accepting)):
+            if classes[state] not in dead:
+                numbers.setdefault(classes[state], len(numbers))
+        table = array('i', [-1] * (len(numbers) * len(symbols)))
+        result_accepting = bytearray(len(numbers))
+        for state, row in enumerate(transitions):
+            if classes[state] in dead:
+                continue
+            number = numbers[classes[state]]
+            result_accepting[number] = accepting[state]
+            for column, target in enumerate(row):
+                table[number * len(symbols) + column] = numbers.get(classes[target], -1)
+        return cls(symbols, table, result_accepting, numbers.get(classes[0], -1))
+
+    def predict(self, word: Word) -> bool:
+        if isinstance(word, str):
+            columns = self.columns
+        else:
+            columns = self.code_columns
+            word = as_codes(word)
+        table = self.table
+        width = len(self.symbols)
+        state = self.start
+        if state < 0:
+            return False
+        for letter in word:
+            column = columns.get(letter)
+            if column is None:
+                return False
+            state = table[state * width + column]
+            if state < 0:
+                return False
+        return bool(self.accepting[state])
+
+    def predict_many(self, words: Iterable[Word]) -> List[bool]:
+        return [self.predict(word) for word in words]
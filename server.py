@@ -0,0 +1,189 @@
+from __future__ import annotations
+import asyncio
+import json
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+
+from earley import Earley
+from lr import LR
+
+
+Parser = Union[Earley, LR]
+
+_worker_parsers = None
+
+
+def _init_worker(parsers: Dict[str, Parser]) -> None:
+    global _worker_parsers
+    _worker_parsers = parsers
+
+
+def _run_batch(batch: List[Tuple[str, str]],
+               parsers: Optional[Dict[str, Parser]] = None) -> List[str]:
+    parsers = parsers if parsers is not None else _worker_parsers
+    result = []
+    for name, word in batch:
+        if name not in parsers:
+            result.append(f'ERROR unknown grammar {name}')
+            continue
+        try:
+            result.append('Yes' if parsers[name].predict(word) else 'No')
+        except Exception as e:
+            result.append(f'ERROR {e}')
+    return result
+
+
+class Metrics:
+    def __init__(self, window: int = 4096) -> Metrics:
+        self.requests = 0
+        self.batches = 0
+        self.queue_latency = deque(maxlen=window)
+        self.batch_time = deque(maxlen=window)
+
+    def to_dict(self, queued: int) -> Dict[str, object]:
+        latency = sorted(self.queue_latency)
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'queued': queued,
+            'mean_batch_size': self.requests / self.batches if self.batches else 0.0,
+            'queue_latency_mean': sum(latency) / len(latency) if latency else 0.0,
+            'queue_latency_p50': latency[len(latency) // 2] if latency else 0.0,
+            'queue_latency_p99': latency[len(latency) * 99 // 100] if latency else 0.0,
+            'queue_latency_max': latency[-1] if latency else 0.0,
+            'batch_time_mean': (sum(self.batch_time) / len(self.batch_time)
+                                if self.batch_time else 0.0),
+        }
+
+
+class ParseServer:
+    def __init__(self, parsers: Dict[str, Parser], batch_size: int = 64,
+                 batch_delay: float = 0.002, max_queue: int = 1024, workers: int = 1,
+                 processes: bool = False, line_limit: int = 2 ** 16) -> ParseServer:
+        self.parsers = parsers
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.max_queue = max_queue
+        self.workers = workers
+        self.processes = processes
+        self.line_limit = line_limit
+        self.metrics = Metrics()
+        self._queue = None
+        self._executor = None
+        self._batchers = []
+        self._handlers = set()
+        self._server = None
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0,
+                    path: Optional[str] = None) -> None:
+        self._queue = asyncio.Queue(self.max_queue)
+        self._executor = self._make_executor()
+        self._batchers = [asyncio.create_task(self._batcher()) for _ in range(self.workers)]
+        if path is not None:
+            self._server = await asyncio.start_unix_server(self._handle, path=path,
+                                                           limit=self.line_limit)
+        else:
+            self._server = await asyncio.start_server(self._handle, host, port,
+                                                      limit=self.line_limit)
+
+    def address(self) -> Union[str, Tuple[str, int]]:
+        return self._server.sockets[0].getsockname()
+
+    async def serve_forever(self) -> None:
+        await self._server.serve_forever()
+
+    async def close(self) -> None:
+        self._server.close()
+        for handler in list(self._handlers):
+            handler.cancel()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        await self._server.wait_closed()
+        for batcher in self._batchers:
+            batcher.cancel()
+        await asyncio.gather(*self._batchers, return_exceptions=True)
+        self._executor.shutdown(wait=True)
+
+    def _make_executor(self) -> Executor:
+        if self.processes:
+            return ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                       initargs=(self.parsers,))
+        return ThreadPoolExecutor(self.workers)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        handler = asyncio.current_task()
+        self._handlers.add(handler)
+        pending = asyncio.Queue()
+        responder = asyncio.create_task(self._respond(pending, writer))
+        try:
+            while True:
+                future = asyncio.get_running_loop().create_future()
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    future.set_result(f'ERROR line longer than {self.line_limit} bytes')
+                    await pending.put(future)
+                    break
+                if not line:
+                    break
+                try:
+                    line = line.decode('utf-8').rstrip('\r\n')
+                except UnicodeDecodeError as e:
+                    future.set_result(f'ERROR {e}')
+                    await pending.put(future)
+                    continue
+                if line == 'STATS':
+                    future.set_result(json.dumps(self.metrics.to_dict(self._queue.qsize())))
+                elif '\t' not in line:
+                    future.set_result('ERROR wrong request format')
+                else:
+                    name, word = line.split('\t', 1)
+                    await self._queue.put((name, word, future, time.perf_counter()))
+                await pending.put(future)
+            await pending.put(None)
+            await responder
+        except asyncio.CancelledError:
+            pass
+        finally:
+            responder.cancel()
+            self._handlers.discard(handler)
+            writer.close()
+
+    async def _respond(self, pending: asyncio.Queue, writer: asyncio.StreamWriter) -> None:
+        while True:
+            future = await pending.get()
+            if future is None:
+                return
+            writer.write((await future).encode('utf-8') + b'\n')
+            await writer.drain()
+
+    async def _batcher(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_delay
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            started = time.perf_counter()
+            for _, _, _, enqueued in batch:
+                self.metrics.queue_latency.append(started - enqueued)
+            requests = [(name, word) for name, word, _, _ in batch]
+            parsers = None if self.processes else self.parsers
+            try:
+                results = await loop.run_in_executor(self._executor, _run_batch, requests,
+                                                     parsers)
+            except Exception as e:
+                results = [f'ERROR {e}'] * len(batch)
+            self.metrics.batch_time.append(time.perf_counter() - started)
+            self.metrics.requests += len(batch)
+            self.metrics.batches += 1
+            for (_, _, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
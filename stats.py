@@ -0,0 +1,71 @@
+from __future__ import annotations
+import json
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+
+class Stats:
+    def __init__(self, name: str) -> Stats:
+        self.name = name
+        self.counters = {}
+        self.timings = {}
+        self.columns = []
+
+    def reset(self) -> None:
+        self.counters = {}
+        self.timings = {}
+        self.columns = []
+
+    def add(self, counter: str, value: int = 1) -> None:
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def maximum(self, counter: str, value: int) -> None:
+        if value > self.counters.get(counter, 0):
+            self.counters[counter] = value
+
+    def column(self, **values: int) -> None:
+        self.columns.append(values)
+
+    @contextmanager
+    def timer(self, phase: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[phase] = self.timings.get(phase, 0.0) + time.perf_counter() - start
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            'name': self.name,
+            'counters': dict(self.counters),
+            'timings': dict(self.timings),
+            'columns': [dict(column) for column in self.columns],
+        }
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def folded(self) -> List[str]:
+        lines = []
+        for i, column in enumerate(self.columns):
+            for key, value in column.items():
+                if key != 'items' and value:
+                    lines.append(f'{self.name};D{i};{key} {value}')
+        for phase, seconds in self.timings.items():
+            lines.append(f'{self.name};fit;{phase} {int(seconds * 1e6)}')
+        return lines
+
+    def report(self, width: int = 40) -> str:
+        lines = []
+        widest = max([column.get('items', 0) for column in self.columns], default=0)
+        for i, column in enumerate(self.columns):
+            items = column.get('items', 0)
+            bar = '#' * (items * width // widest if widest else 0)
+            details = ' '.join(f'{key}={value}' for key, value in column.items() if key != 'items')
+            lines.append(f'D{i:<4} {items:>8} {bar:<{width}} {details}'.rstrip())
+        for counter, value in sorted(self.counters.items()):
+            lines.append(f'{counter}: {value}')
+        for phase, seconds in self.timings.items():
+            lines.append(f'{phase}: {seconds * 1000:.3f} ms')
+        return '\n'.join(lines)
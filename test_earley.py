@@ -1,7 +1,11 @@
+import gc
+import pickle
+import time
+from array import array
 import pytest
 
 from conftest import grammar
-from utils import Rule, Grammar
+from utils import Rule, Grammar, BudgetExceeded
 from earley import Earley
 
 
@@ -339,3 +343,142 @@ def test_algo_SAB(grammar):
     assert algo.predict('abcabcabc') == True
     assert algo.predict('abcab')     == False
     assert algo.predict('')          == True
+
+
+@pytest.mark.parametrize('nonterms', [{*'S'}])
+@pytest.mark.parametrize('terms', [{*'()'}])
+@pytest.mark.parametrize('rules', [{Rule('S', '(S)S'), Rule('S', '')}])
+@pytest.mark.parametrize('start', 'S')
+def test_stats(grammar):
+    algo = Earley(collect_stats=True)
+    algo.fit(grammar)
+    assert algo.predict('(())') == True
+    assert len(algo.stats.columns) == 5
+    assert algo.stats.counters['items'] == sum(column['items'] for column in algo.stats.columns)
+    assert algo.stats.counters['scan'] > 0
+    assert 'earley;D0;predict 1' in algo.stats.folded()
+    assert '"words": 1' in algo.stats.to_json()
+    assert Earley().stats is None
+
+
+@pytest.mark.parametrize('nonterms', [{*'SA'}])
+@pytest.mark.parametrize('terms', [{*'ab'}])
+@pytest.mark.parametrize('rules', [{Rule('A', 'S'), Rule('S', 'aSbS'), Rule('S', '')}])
+@pytest.mark.parametrize('start', 'A')
+def test_prediction_closure(grammar):
+    algo = Earley()
+    algo.fit(grammar)
+    assert algo.nullable == {'A', 'S'}
+    assert algo.prediction['A'] == {(Rule('A', 'S'), 0), (Rule('A', 'S'), 1),
+                                    (Rule('S', 'aSbS'), 0), (Rule('S', ''), 0)}
+    assert algo.prediction['S'] == {(Rule('S', 'aSbS'), 0), (Rule('S', ''), 0)}
+
+
+@pytest.mark.parametrize('nonterms', [{*'S'}])
+@pytest.mark.parametrize('terms', [{*'ab'}])
+@pytest.mark.parametrize('rules', [{Rule('S', 'aSbS'), Rule('S', '')}])
+@pytest.mark.parametrize('start', 'S')
+def test_bytes_and_token_arrays(grammar):
+    algo = Earley()
+    algo.fit(grammar)
+    assert algo.predict(b'aababb')                         == True
+    assert algo.predict(bytearray(b'aabbba'))              == False
+    assert algo.predict(memoryview(b'abab'))               == True
+    assert algo.predict(array('H', map(ord, 'aaabbb')))    == True
+    assert algo.predict(array('H', [ord('a'), 0x2603]))    == False
+    assert algo.predict(b'')                               == True
+
+
+@pytest.mark.parametrize('nonterms', [{*'SA'}])
+@pytest.mark.parametrize('terms', [{*'abc'}])
+@pytest.mark.parametrize('rules', [{Rule('A', 'S'), Rule('S', 'aSbS'), Rule('S', '')}])
+@pytest.mark.parametrize('start', 'A')
+def test_refit(grammar):
+    algo = Earley(collect_stats=True)
+    algo.fit(grammar)
+    assert algo.predict('acb') == False
+    grammar.add_rule(Rule('S', 'c'))
+    assert algo.stale == True
+    assert algo.predict('acb') == True
+    assert algo.prediction['A'] >= {(Rule('S', 'c'), 0)}
+    grammar.remove_rule(Rule('S', ''))
+    assert algo.predict('acb') == False
+    assert algo.predict('acbc') == True
+    assert algo.nullable == set()
+    assert (Rule('A', 'S'), 1) not in algo.prediction['A']
+    grammar.remove_rule(Rule('S', 'c'))
+    assert algo.predict('') == False
+    assert algo.predict('ab') == False
+
+
+@pytest.mark.parametrize('nonterms', [{*'S'}])
+@pytest.mark.parametrize('terms', [{*'ab'}])
+@pytest.mark.parametrize('rules', [{Rule('S', 'aSbS'), Rule('S', '')}])
+@pytest.mark.parametrize('start', 'S')
+def test_weak_listeners(grammar):
+    algo = Earley()
+    algo.fit(grammar)
+    assert len(grammar._listeners) == 1
+    copy = pickle.loads(pickle.dumps(grammar))
+    assert copy._listeners == []
+    assert copy.rules() == grammar.rules()
+    del algo
+    gc.collect()
+    grammar.add_rule(Rule('S', 'ab'))
+    assert grammar._listeners == []
+
+
+@pytest.mark.parametrize('nonterms', [{*'ETF'}])
+@pytest.mark.parametrize('terms', [{*'+*()a'}])
+@pytest.mark.parametrize('rules', [{Rule('E', 'E+T'), Rule('E', 'T'), Rule('T', 'T*F'),
+                                    Rule('T', 'F'), Rule('F', '(E)'), Rule('F', 'a')}])
+@pytest.mark.parametrize('start', 'E')
+def test_memory_bounded(grammar):
+    word = 'a' + '+(a*a)' * 200
+    full = Earley(collect_stats=True, use_dfa=False)
+    full.fit(grammar)
+    algo = Earley(collect_stats=True, use_dfa=False, memory_bounded=True)
+    algo.fit(grammar)
+    assert algo.predict(word)        == True
+    assert algo.predict(word + '+')  == False
+    assert algo.predict('((a)*(a+a')  == False
+    assert algo.predict('((a)*(a+a))') == True
+    assert full.predict(word)        == True
+    assert algo.stats.counters['peak_items'] < 50
+    assert algo.stats.counters['peak_columns'] < 10
+    assert full.stats.counters['peak_items'] > 1000
+
+
+@pytest.mark.parametrize('nonterms', [{*'S'}])
+@pytest.mark.parametrize('terms', [{*'a'}])
+@pytest.mark.parametrize('rules', [{Rule('S', 'SS'), Rule('S', 'a')}])
+@pytest.mark.parametrize('start', 'S')
+def test_budget(grammar):
+    algo = Earley(collect_stats=True, use_dfa=False)
+    algo.fit(grammar)
+    assert algo.predict('aaaa', max_items=1000) == True
+    with pytest.raises(BudgetExceeded) as info:
+        algo.predict('a' * 200, max_items=1000)
+    assert info.value.items == 1001
+    assert 0 < info.value.position < 200
+    assert info.value.elapsed >= 0
+    with pytest.raises(BudgetExceeded):
+        algo.predict('a' * 200, deadline=time.monotonic())
+    assert algo.stats.counters['budget_exceeded'] == 2
+    assert algo.predict('a' * 20, deadline=time.monotonic() + 60) == True
+
+
+@pytest.mark.parametrize('nonterms', [{*'S'}])
+@pytest.mark.parametrize('terms', [{*'()[]'}])
+@pytest.mark.parametrize('rules', [{Rule('S', '(S)S'), Rule('S', '[S]S'), Rule('S', '')}])
+@pytest.mark.parametrize('start', 'S')
+def test_lookahead(grammar):
+    algo = Earley(collect_stats=True, use_dfa=False)
+    algo.fit(grammar)
+    assert algo.lookahead_prediction['S']['('] == {(Rule('S', '(S)S'), 0), (Rule('S', ''), 0)}
+    assert algo.lookahead_prediction['S'][None] == {(Rule('S', ''), 0)}
+    plain = Earley(collect_stats=True, use_dfa=False, lookahead=False)
+    plain.fit(grammar)
+    for word in ['([])[]', '([)]', '', '(((', '[[]]()']:
+        assert algo.predict(word) == plain.predict(word)
+    assert algo.stats.counters['items'] < plain.stats.counters['items']
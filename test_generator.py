@@ -0,0 +1,63 @@
+import pytest
+
+from conftest import grammar
+from utils import Rule, Grammar
+from earley import Earley
+from generator import WordGenerator
+
+
+@pytest.mark.parametrize('nonterms', [{*'SA'}])
+@pytest.mark.parametrize('terms', [{*'ab'}])
+@pytest.mark.parametrize('rules', [{Rule('A', 'S'), Rule('S', 'aSbS'), Rule('S', '')}])
+@pytest.mark.parametrize('start', 'A')
+def test_counts(grammar):
+    generator = WordGenerator(grammar, 20)
+    assert [generator.count(n) for n in range(0, 21, 2)] == [1, 1, 2, 5, 14, 42, 132, 429, 1430,
+                                                            4862, 16796]
+    assert generator.count(7)  == 0
+    assert generator.count(22) == 0
+    with pytest.raises(Exception, match='No words of length 7'):
+        generator.word(7)
+
+
+@pytest.mark.parametrize('nonterms', [{*'SFG'}])
+@pytest.mark.parametrize('terms', [{*'ab'}])
+@pytest.mark.parametrize('rules', [{Rule('S', 'aFbF'), Rule('F', 'aFb'), Rule('F', ''),
+                                    Rule('F', 'Ga'), Rule('G', 'bSG')}])
+@pytest.mark.parametrize('start', 'S')
+def test_words_are_valid(grammar):
+    algo = Earley()
+    algo.fit(grammar)
+    generator = WordGenerator(grammar, 30, seed=0)
+    for length in [2, 4, 10, 30]:
+        for word in generator.words(length, 5):
+            assert len(word) == length
+            assert algo.predict(word) == True
+
+
+@pytest.mark.parametrize('nonterms', [{*'S'}])
+@pytest.mark.parametrize('terms', [{*'ab'}])
+@pytest.mark.parametrize('rules', [{Rule('S', 'aSbS'), Rule('S', '')}])
+@pytest.mark.parametrize('start', 'S')
+def test_uniform(grammar):
+    generator = WordGenerator(grammar, 6, seed=1)
+    counts = {}
+    for word in generator.words(6, 2500):
+        counts[word] = counts.get(word, 0) + 1
+    assert len(counts) == 5
+    assert min(counts.values()) > 400
+
+
+@pytest.mark.parametrize('nonterms', [{*'S'}])
+@pytest.mark.parametrize('terms', [{*'()'}])
+@pytest.mark.parametrize('rules', [{Rule('S', '(S)S'), Rule('S', '')}])
+@pytest.mark.parametrize('start', 'S')
+def test_negatives(grammar, tmp_path):
+    algo = Earley()
+    algo.fit(grammar)
+    generator = WordGenerator(grammar, 16, seed=2)
+    for word in generator.negatives(16, 20, algo):
+        assert algo.predict(word) == False
+    assert generator.write(tmp_path / 'words', [2, 3, 8], 4) == 8
+    for word in (tmp_path / 'words').read_text().split():
+        assert algo.predict(word) == True
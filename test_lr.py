@@ -1,7 +1,10 @@
+import mmap
+import time
+from array import array
 import pytest
 
-from utils import Rule, Grammar
-from lr import LR
+from utils import Rule, Grammar, BudgetExceeded
+from lr import LR, NotLR1Grammar
 from conftest import grammar
 
 
@@ -285,3 +288,220 @@ def test_algo_SAB(grammar):
     assert algo.predict('abcabcabc') == True
     assert algo.predict('abcab')     == False
     assert algo.predict('')          == True
+
+
+@pytest.mark.parametrize('nonterms', [{*'S'}])
+@pytest.mark.parametrize('terms', [{*'()'}])
+@pytest.mark.parametrize('rules', [{Rule('S', '(S)S'), Rule('S', '')}])
+@pytest.mark.parametrize('start', 'S')
+def test_stats(grammar):
+    algo = LR(collect_stats=True)
+    algo.fit(grammar)
+    assert algo.stats.counters['states'] == len(algo.nodes)
+    assert algo.stats.counters['closure_iterations'] > 0
+    assert algo.stats.counters['first_calls'] > 0
+    assert set(algo.stats.timings) == {'nodes', 'fill_table', 'dfa'}
+    assert algo.predict('(())') == True
+    assert algo.stats.counters['shift'] == 4
+    assert algo.stats.counters['max_stack_depth'] >= 4
+    assert '"reduce"' in algo.stats.to_json()
+
+
+@pytest.mark.parametrize('nonterms', [{*'ETF'}])
+@pytest.mark.parametrize('terms', [{*'+*()a'}])
+@pytest.mark.parametrize('rules', [{Rule('E', 'E+T'), Rule('E', 'T'), Rule('T', 'T*F'),
+                                    Rule('T', 'F'), Rule('F', '(E)'), Rule('F', 'a')}])
+@pytest.mark.parametrize('start', 'E')
+def test_lazy(grammar):
+    eager = LR()
+    eager.fit(grammar)
+    algo = LR(lazy=True)
+    algo.fit(grammar)
+    assert len(algo.nodes) == 1
+    assert algo.predict('a+a')     == True
+    assert algo.predict('a+')      == False
+    assert len(algo.nodes) < len(eager.nodes)
+    assert algo.predict('(a+a)*a') == True
+    assert algo.predict('(a+a*a')  == False
+    algo.warm(background=True).join()
+    assert len(algo.nodes) == len(eager.nodes)
+    assert algo.conflicts == []
+
+
+@pytest.mark.parametrize('nonterms', [{*'SBC'}])
+@pytest.mark.parametrize('terms', [{*'abc'}])
+@pytest.mark.parametrize('rules', [{Rule('S', 'B'), Rule('B', 'baa'), Rule('S', 'C'),
+                                    Rule('C', 'baa')}])
+@pytest.mark.parametrize('start', 'S')
+def test_lazy_conflict(grammar):
+    algo = LR(lazy=True)
+    algo.fit(grammar)
+    assert algo.predict('a') == False
+    with pytest.raises(NotLR1Grammar):
+        algo.predict('baa')
+    conflicts = list(algo.conflicts)
+    assert conflicts != []
+    with pytest.raises(NotLR1Grammar):
+        algo.predict('baa')
+    algo.warm()
+    assert algo.conflicts == conflicts
+
+
+@pytest.mark.parametrize('nonterms', [{*'S'}])
+@pytest.mark.parametrize('terms', [{*'ab'}])
+@pytest.mark.parametrize('rules', [{Rule('S', 'aSbS'), Rule('S', '')}])
+@pytest.mark.parametrize('start', 'S')
+def test_bytes_and_token_arrays(grammar, tmp_path):
+    algo = LR()
+    algo.fit(grammar)
+    assert algo.predict(b'aababb')                         == True
+    assert algo.predict(bytearray(b'aabbba'))              == False
+    assert algo.predict(memoryview(b'abab'))               == True
+    assert algo.predict(array('H', map(ord, 'aaabbb')))    == True
+    assert algo.predict(array('H', [ord('a'), 0x2603]))    == False
+    assert algo.predict(b'ab$')                            == False
+    (tmp_path / 'word').write_bytes(b'ab' * 1000)
+    with open(tmp_path / 'word', 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            assert algo.predict(mapped) == True
+
+
+@pytest.mark.parametrize('nonterms', [{*'SAB'}])
+@pytest.mark.parametrize('terms', [{*'ab'}])
+@pytest.mark.parametrize('rules', [{Rule('S', 'aBS'), Rule('A', 'bB'), Rule('S', 'A'),
+                                    Rule('B', 'aa')}])
+@pytest.mark.parametrize('start', 'S')
+def test_first_lookaheads(grammar):
+    algo = LR(use_dfa=False)
+    algo.fit(grammar)
+    assert algo.first('AS$') == {'b'}
+    assert algo.predict('aaabaa') == True
+    assert algo.predict('baa')    == True
+    assert algo.predict('aaab')   == False
+
+
+@pytest.mark.parametrize('nonterms', [{*'ETF'}])
+@pytest.mark.parametrize('terms', [{*'+*()ab'}])
+@pytest.mark.parametrize('rules', [{Rule('E', 'E+T'), Rule('E', 'T'), Rule('T', 'T*F'),
+                                    Rule('T', 'F'), Rule('F', '(E)'), Rule('F', 'a')}])
+@pytest.mark.parametrize('start', 'E')
+@pytest.mark.parametrize('lazy', [False, True])
+def test_refit(grammar, lazy):
+    algo = LR(collect_stats=True, lazy=lazy, use_dfa=False)
+    algo.fit(grammar)
+    assert algo.predict('a+b') == False
+    grammar.add_rule(Rule('F', 'b'))
+    assert algo.stale == True
+    assert algo.predict('a+b') == True
+    assert algo.stale == False
+    assert algo.stats.counters['closures_invalidated'] > 0
+    assert algo.stats.counters['closure_cache_hits'] > 0
+    grammar.remove_rule(Rule('F', '(E)'))
+    assert algo.predict('(a)*b') == False
+    assert algo.predict('a*b+a') == True
+    grammar.add_rule(Rule('E', 'E+E'))
+    with pytest.raises(NotLR1Grammar):
+        algo.predict('a+a+a')
+    grammar.remove_rule(Rule('E', 'E+E'))
+    assert algo.predict('a*b') == True
+
+
+@pytest.mark.parametrize('nonterms', [{*'S'}])
+@pytest.mark.parametrize('terms', [{*'()'}])
+@pytest.mark.parametrize('rules', [{Rule('S', '(S)S'), Rule('S', '')}])
+@pytest.mark.parametrize('start', 'S')
+def test_budget(grammar):
+    algo = LR(collect_stats=True)
+    algo.fit(grammar)
+    assert algo.predict('(())', max_items=100) == True
+    with pytest.raises(BudgetExceeded) as info:
+        algo.predict('()' * 100, max_items=100)
+    assert info.value.items == 101
+    assert info.value.position < 100
+    with pytest.raises(BudgetExceeded):
+        algo.predict('()' * 100, deadline=time.monotonic())
+    assert algo.stats.counters['budget_exceeded'] == 2
+
+
+def make_expr(rules, precedence):
+    grammar = Grammar({*'ETF'}, {*'+*^()a'})
+    for rule in rules:
+        grammar.add_rule(rule)
+    for associativity, terms in precedence:
+        grammar.declare(associativity, terms)
+    grammar.start = 'E'
+    return grammar
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_precedence(lazy):
+    compact = make_expr([Rule('E', 'E+E'), Rule('E', 'E*E'), Rule('E', 'E^E'), Rule('E', '(E)'),
+                         Rule('E', 'a')], [('left', '+'), ('left', '*'), ('right', '^')])
+    stratified = make_expr([Rule('E', 'E+T'), Rule('E', 'T'), Rule('T', 'T*F'), Rule('T', 'F'),
+                            Rule('F', 'a^F'), Rule('F', '(E)^F'), Rule('F', '(E)'),
+                            Rule('F', 'a')], [])
+    algo = LR(collect_stats=True, lazy=lazy)
+    algo.fit(compact)
+    baseline = LR(collect_stats=True, lazy=lazy)
+    baseline.fit(stratified)
+    for word in ['a+a*a^a^a', '(a+a)*a+a^(a)', 'a+*a', 'a^', '((a)']:
+        assert algo.predict(word) == baseline.predict(word)
+    assert algo.stats.counters['resolved_conflicts'] > 0
+    assert algo.stats.counters['shift'] == baseline.stats.counters['shift']
+    assert algo.stats.counters['reduce'] < baseline.stats.counters['reduce']
+    if not lazy:
+        assert len(algo.table) < len(baseline.table)
+
+
+def test_precedence_nonassoc():
+    grammar = make_expr([Rule('E', 'E+E'), Rule('E', 'E*E'), Rule('E', 'a')],
+                        [('nonassoc', '+'), ('left', '*')])
+    for algo in [LR(), LR(lazy=True)]:
+        algo.fit(grammar)
+        assert algo.predict('a+a')     == True
+        assert algo.predict('a*a*a+a') == True
+        assert algo.predict('a+a+a')   == False
+        assert algo.predict('a+a*a+a') == False
+
+
+def test_declare_after_fit():
+    grammar = make_expr([Rule('E', 'E+E'), Rule('E', 'E*E'), Rule('E', 'a')],
+                        [('left', '+'), ('left', '*')])
+    algos = [LR(), LR(lazy=True)]
+    for algo in algos:
+        algo.fit(grammar)
+        assert algo.predict('a+a+a') == True
+    grammar.declare('nonassoc', '+')
+    for algo in algos:
+        assert algo.stale == True
+        assert algo.predict('a+a+a') == False
+        assert algo.predict('a*a+a') == True
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_precedence_conflicts(lazy):
+    with pytest.raises(Exception, match='Unknown associativity middle'):
+        make_expr([], [('middle', '+')])
+    grammar = make_expr([Rule('E', 'E+E'), Rule('E', 'E*E'), Rule('E', 'a')], [('left', '+')])
+    algo = LR(lazy=lazy)
+    with pytest.raises(NotLR1Grammar):
+        algo.fit(grammar)
+        algo.predict('a+a*a')
+    grammar = make_expr([Rule('E', 'T'), Rule('E', 'F'), Rule('T', 'a'), Rule('F', 'a')],
+                        [('left', 'a')])
+    algo = LR(lazy=lazy)
+    with pytest.raises(NotLR1Grammar):
+        algo.fit(grammar)
+        algo.predict('a')
+    grammar = Grammar({*'SAB'}, {*'xa+'})
+    for rule in [Rule('S', 'A+'), Rule('S', 'xB+'), Rule('S', 'xa+a'), Rule('A', 'xa'),
+                 Rule('B', 'a')]:
+        grammar.add_rule(rule)
+    grammar.declare('left', 'a')
+    grammar.declare('left', '+')
+    grammar.start = 'S'
+    algo = LR(lazy=lazy)
+    with pytest.raises(NotLR1Grammar):
+        algo.fit(grammar)
+        algo.predict('xa+')
+    assert algo.conflicts != []
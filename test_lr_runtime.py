@@ -0,0 +1,178 @@
+import os
+import subprocess
+import sys
+from array import array
+import pytest
+
+from conftest import grammar
+from utils import Rule, Grammar
+from lr import LR, NotLR1Grammar
+from lr_runtime import LRRuntime
+
+
+WORDS = ['', 'ab', 'abab', 'aababb', 'aaabbbababab', 'a', 'ba', 'abb', 'aba', ' ', 'ab$']
+
+
+@pytest.mark.parametrize('nonterms', [{*'SA'}])
+@pytest.mark.parametrize('terms', [{*'ab'}])
+@pytest.mark.parametrize('rules', [{Rule('A', 'S'), Rule('S', 'aSbS'), Rule('S', '')}])
+@pytest.mark.parametrize('start', 'A')
+def test_same_as_lr(grammar):
+    algo = LR()
+    algo.fit(grammar)
+    runtime = LRRuntime.from_lr(algo)
+    for word in WORDS:
+        assert runtime.predict(word) == algo.predict(word)
+
+
+@pytest.mark.parametrize('nonterms', [{*'SA'}])
+@pytest.mark.parametrize('terms', [{*'ab'}])
+@pytest.mark.parametrize('rules', [{Rule('A', 'S'), Rule('S', 'aSbS'), Rule('S', '')}])
+@pytest.mark.parametrize('start', 'A')
+def test_lazy(grammar):
+    algo = LR(lazy=True)
+    algo.fit(grammar)
+    runtime = LRRuntime.from_lr(algo)
+    for word in WORDS:
+        assert runtime.predict(word) == algo.predict(word)
+
+
+@pytest.mark.parametrize('nonterms', [{*'SBC'}])
+@pytest.mark.parametrize('terms', [{*'abc'}])
+@pytest.mark.parametrize('rules', [{Rule('S', 'B'), Rule('B', 'baa'), Rule('S', 'C'),
+                                    Rule('C', 'baa')}])
+@pytest.mark.parametrize('start', 'S')
+def test_lazy_conflict(grammar):
+    algo = LR(lazy=True)
+    algo.fit(grammar)
+    with pytest.raises(NotLR1Grammar):
+        LRRuntime.compile(algo)
+
+
+@pytest.mark.parametrize('nonterms', [{*'SAB'}])
+@pytest.mark.parametrize('terms', [{*'abc'}])
+@pytest.mark.parametrize('rules', [{Rule('S', 'SABBAabc'), Rule('S', ''), Rule('A', ''),
+                                    Rule('B', '')}])
+@pytest.mark.parametrize('start', 'S')
+def test_save_and_load(grammar, tmp_path):
+    algo = LR()
+    algo.fit(grammar)
+    LRRuntime.from_lr(algo).save(tmp_path / 'table.bin')
+    runtime = LRRuntime.load(tmp_path / 'table.bin')
+    assert runtime.predict('abc')       == True
+    assert runtime.predict('abcabcabc') == True
+    assert runtime.predict('abcab')     == False
+    assert runtime.predict('')          == True
+    runtime.close()
+
+
+@pytest.mark.parametrize('nonterms', [{*'S'}])
+@pytest.mark.parametrize('terms', [{*'()'}])
+@pytest.mark.parametrize('rules', [{Rule('S', '(S)S'), Rule('S', '')}])
+@pytest.mark.parametrize('start', 'S')
+def test_shared_memory(grammar):
+    algo = LR()
+    algo.fit(grammar)
+    block = LRRuntime.from_lr(algo).to_shared_memory()
+    try:
+        runtime = LRRuntime.attach(block.name)
+        assert runtime.predict('(())()') == True
+        assert runtime.predict('(()')    == False
+        assert runtime.to_bytes() == LRRuntime.compile(algo)
+        runtime.close()
+    finally:
+        block.close()
+        block.unlink()
+
+
+@pytest.mark.parametrize('nonterms', [{*'S'}])
+@pytest.mark.parametrize('terms', [{*'()'}])
+@pytest.mark.parametrize('rules', [{Rule('S', '(S)S'), Rule('S', '')}])
+@pytest.mark.parametrize('start', 'S')
+def test_shared_memory_workers(grammar):
+    algo = LR()
+    algo.fit(grammar)
+    block = LRRuntime.from_lr(algo).to_shared_memory()
+    script = ('from lr_runtime import LRRuntime\n'
+              f'runtime = LRRuntime.attach({block.name!r})\n'
+              'print(runtime.predict(\'(())()\'))\n'
+              'runtime.close()\n')
+    try:
+        for _ in range(2):
+            result = subprocess.run([sys.executable, '-c', script], capture_output=True,
+                                    text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+            assert result.returncode == 0, result.stderr
+            assert result.stdout == 'True\n'
+            assert 'leaked' not in result.stderr
+    finally:
+        block.close()
+        block.unlink()
+
+
+@pytest.mark.parametrize('nonterms', [{*'S'}])
+@pytest.mark.parametrize('terms', [{*'()'}])
+@pytest.mark.parametrize('rules', [{Rule('S', '(S)S'), Rule('S', '')}])
+@pytest.mark.parametrize('start', 'S')
+def test_compressed_not_smaller(grammar):
+    algo = LR()
+    algo.fit(grammar)
+    dense = LRRuntime.from_lr(algo)
+    runtime = LRRuntime.from_lr(algo, compress=True)
+    assert runtime.compressed == False
+    assert runtime.nbytes == dense.nbytes
+    assert runtime.predict('(())()') == True
+
+
+@pytest.mark.parametrize('nonterms', [{*'ETF'}])
+@pytest.mark.parametrize('terms', [{*'+*()a'}])
+@pytest.mark.parametrize('rules', [{Rule('E', 'E+T'), Rule('E', 'T'), Rule('T', 'T*F'),
+                                    Rule('T', 'F'), Rule('F', '(E)'), Rule('F', 'a')}])
+@pytest.mark.parametrize('start', 'E')
+def test_compressed(grammar, tmp_path):
+    algo = LR()
+    algo.fit(grammar)
+    dense = LRRuntime.from_lr(algo)
+    compressed = LRRuntime.from_lr(algo, compress=True)
+    assert compressed.compressed == True
+    assert compressed.nbytes < dense.nbytes
+    for state, row in enumerate(algo.table):
+        for symbol, action in row.items():
+            if isinstance(action, LR.Shift):
+                column = compressed.columns[symbol]
+                assert compressed.action(state, column) == dense.action(state, column)
+    for word in ['a', 'a+a*a', '(a+a)*a', '((a))', '', '+', 'a+', '(a', 'a)', 'aa', 'a*(a+a']:
+        assert compressed.predict(word) == dense.predict(word) == algo.predict(word)
+    compressed.save(tmp_path / 'table.bin')
+    loaded = LRRuntime.load(tmp_path / 'table.bin')
+    assert loaded.compressed == True
+    assert loaded.predict('a*(a+a)') == True
+    loaded.close()
+
+
+@pytest.mark.parametrize('nonterms', [{*'S'}])
+@pytest.mark.parametrize('terms', [{*'()'}])
+@pytest.mark.parametrize('rules', [{Rule('S', '(S)S'), Rule('S', '')}])
+@pytest.mark.parametrize('start', 'S')
+def test_bytes_and_token_arrays(grammar):
+    algo = LR()
+    algo.fit(grammar)
+    for runtime in [LRRuntime.from_lr(algo), LRRuntime.from_lr(algo, compress=True)]:
+        assert runtime.predict(b'(())()')                    == True
+        assert runtime.predict(memoryview(b'(()'))           == False
+        assert runtime.predict(array('H', map(ord, '()()'))) == True
+        assert runtime.predict(array('H', [0x2603]))         == False
+
+
+def test_precedence_error_entries():
+    grammar = Grammar({*'E'}, {*'+*a'})
+    for rule in [Rule('E', 'E+E'), Rule('E', 'E*E'), Rule('E', 'a')]:
+        grammar.add_rule(rule)
+    grammar.declare('nonassoc', '+')
+    grammar.declare('left', '*')
+    grammar.start = 'E'
+    algo = LR()
+    algo.fit(grammar)
+    for compress in [False, True]:
+        runtime = LRRuntime.from_lr(algo, compress=compress)
+        for word in ['a+a', 'a+a+a', 'a*a+a*a', 'a+a*a+a', 'a*', '']:
+            assert runtime.predict(word) == algo.predict(word)
@@ -0,0 +1,92 @@
+import io
+import pytest
+
+from conftest import grammar
+from utils import Rule, Grammar, BudgetExceeded
+from checker import check
+from parser import Parser
+
+
+@pytest.mark.parametrize('nonterms', [{*'S'}])
+@pytest.mark.parametrize('terms', [{*'ab'}])
+@pytest.mark.parametrize('rules', [{Rule('S', 'abS'), Rule('S', '')}])
+@pytest.mark.parametrize('start', 'S')
+def test_regular(grammar):
+    algo = Parser(collect_stats=True)
+    algo.fit(grammar)
+    assert algo.engine_name == 'dfa'
+    assert algo.reason      == 'grammar is right-linear'
+    assert algo.predict('abab') == True
+    assert algo.predict('aba')  == False
+    assert algo.stats.counters['dfa_words'] == 2
+
+
+@pytest.mark.parametrize('nonterms', [{*'S'}])
+@pytest.mark.parametrize('terms', [{*'ab'}])
+@pytest.mark.parametrize('rules', [{Rule('S', 'aSbS'), Rule('S', '')}])
+@pytest.mark.parametrize('start', 'S')
+def test_fallback(grammar):
+    algo = Parser()
+    algo.fit(grammar)
+    assert algo.engine_name == 'lr'
+    assert algo.predict('aabb') == True
+    grammar.add_rule(Rule('S', 'SS'))
+    assert algo.predict('abab') == True
+    assert algo.engine_name == 'practical_earley'
+    assert algo.reason.startswith('not LR(1)')
+    assert algo.predict('abba') == False
+    with pytest.raises(BudgetExceeded):
+        algo.predict('ab' * 50, max_items=100)
+    grammar.remove_rule(Rule('S', 'SS'))
+    assert algo.predict('abab') == True
+    assert algo.engine_name == 'lr'
+
+
+
+@pytest.mark.parametrize('nonterms', [{*'S'}])
+@pytest.mark.parametrize('terms', [{*'ab'}])
+@pytest.mark.parametrize('rules', [{Rule('S', 'aSb'), Rule('S', '')}])
+@pytest.mark.parametrize('start', 'S')
+def test_becomes_regular(grammar):
+    algo = Parser()
+    algo.fit(grammar)
+    assert algo.engine_name == 'lr'
+    assert algo.reason      == f'grammar is LR(1) with {len(algo.engine.table)} states'
+    grammar.remove_rule(Rule('S', 'aSb'))
+    grammar.add_rule(Rule('S', 'aS'))
+    assert algo.predict('aaa') == True
+    assert algo.predict('ab')  == False
+    assert algo.engine_name == 'dfa'
+    assert algo.reason      == 'grammar is right-linear'
+    grammar.add_rule(Rule('S', 'aSb'))
+    assert algo.predict('abb') == False
+    assert algo.engine_name == 'practical_earley'
+    other = Grammar({*'S'}, {*'ab'})
+    other.add_rule(Rule('S', 'aSbS'))
+    other.add_rule(Rule('S', ''))
+    other.start = 'S'
+    algo.fit(other)
+    assert algo.engine_name == 'lr'
+    algo.fit(grammar)
+    assert algo.predict('aab') == True
+
+
+@pytest.mark.parametrize('nonterms', [{*'E'}])
+@pytest.mark.parametrize('terms', [{*'+a'}])
+@pytest.mark.parametrize('rules', [{Rule('E', 'E+E'), Rule('E', 'a')}])
+@pytest.mark.parametrize('start', 'E')
+def test_declare(grammar):
+    algo = Parser()
+    algo.fit(grammar)
+    assert algo.engine_name == 'practical_earley'
+    grammar.declare('left', '+')
+    assert algo.stale == True
+    assert algo.predict('a+a+a') == True
+    assert algo.engine_name == 'lr'
+
+
+def test_check(monkeypatch, capsys):
+    monkeypatch.setattr('sys.stdin', io.StringIO('1 1 3\nS\na\nS->SS\nS->a\nS->\nS\n3\naaa\n\nb\n'))
+    with pytest.raises(Exception, match='Wrong word'):
+        check()
+    assert capsys.readouterr().out == 'Yes\nYes\n'
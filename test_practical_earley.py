@@ -0,0 +1,96 @@
+import pytest
+
+from conftest import grammar
+from utils import Rule, Grammar
+from earley import Earley
+from practical_earley import PracticalEarley
+
+
+@pytest.mark.parametrize('nonterms', [{*'S'}])
+@pytest.mark.parametrize('terms', [{*'()'}])
+@pytest.mark.parametrize('rules', [{Rule('S', '(S)S'), Rule('S', '')}])
+@pytest.mark.parametrize('start', 'S')
+def test_algo_bracket_sequences_same(grammar):
+    algo = PracticalEarley()
+    algo.fit(grammar)
+    assert algo.predict('')     == True
+    assert algo.predict('(')    == False
+    assert algo.predict(')')    == False
+    assert algo.predict('()')   == True
+    assert algo.predict('()()') == True
+    assert algo.predict('(())') == True
+    assert algo.predict('(()')  == False
+    assert algo.predict(')()')  == False
+    assert algo.predict(')()(') == False
+
+
+@pytest.mark.parametrize('nonterms', [{*'SFG'}])
+@pytest.mark.parametrize('terms', [{*'ab'}])
+@pytest.mark.parametrize('rules', [{Rule('S', 'aFbF'), Rule('F', 'aFb'), Rule('F', ''),
+                                    Rule('F', 'Ga'), Rule('G', 'bSG')}])
+@pytest.mark.parametrize('start', 'S')
+def test_algo_aFb_with_G(grammar):
+    algo = PracticalEarley()
+    algo.fit(grammar)
+    assert algo.predict('aabb')       == True
+    assert algo.predict('abab')       == True
+    assert algo.predict('ababab')     == False
+    assert algo.predict('aabbab')     == True
+    assert algo.predict('aabbaaabbb') == True
+    assert algo.predict('a')          == False
+    assert algo.predict('aa')         == False
+    assert algo.predict('aabbb')      == False
+    assert algo.predict('aabb ')      == False
+    assert algo.predict('ba')         == False
+    assert algo.predict('baa')        == False
+
+
+@pytest.mark.parametrize('nonterms', [{*'SA'}])
+@pytest.mark.parametrize('terms', [{*'ab'}])
+@pytest.mark.parametrize('rules', [{Rule('A', 'S'), Rule('S', 'aSbS'), Rule('S', 'bSaS'),
+                                    Rule('S', '')}])
+@pytest.mark.parametrize('start', 'A')
+def test_algo_aSbS_and_bSaS(grammar):
+    algo = PracticalEarley()
+    algo.fit(grammar)
+    assert algo.predict('aababb')       == True
+    assert algo.predict('aabbba')       == True
+    assert algo.predict('ababba')       == True
+    assert algo.predict('abb')          == False
+    assert algo.predict('ba')           == True
+    assert algo.predict('b')            == False
+    assert algo.predict('aba')          == False
+    assert algo.predict('')             == True
+    assert algo.predict(' ')            == False
+    assert algo.predict('babababa')     == True
+    assert algo.predict('bababab')      == False
+
+
+@pytest.mark.parametrize('nonterms', [{*'SAB'}])
+@pytest.mark.parametrize('terms', [{*'abc'}])
+@pytest.mark.parametrize('rules', [{Rule('S', 'SABSBASABAABSSSAabc'), Rule('S', ''),
+                                    Rule('A', ''), Rule('B', '')}])
+@pytest.mark.parametrize('start', 'S')
+def test_algo_SABS(grammar):
+    algo = PracticalEarley()
+    algo.fit(grammar)
+    assert algo.predict('abc')       == True
+    assert algo.predict('a')         == False
+    assert algo.predict('bc')        == False
+    assert algo.predict('abcabc')    == True
+    assert algo.predict('abcabcabc') == True
+    assert algo.predict('abcab')     == False
+    assert algo.predict('')          == True
+
+
+@pytest.mark.parametrize('nonterms', [{*'S'}])
+@pytest.mark.parametrize('terms', [{*'ab'}])
+@pytest.mark.parametrize('rules', [{Rule('S', 'aSbS'), Rule('S', '')}])
+@pytest.mark.parametrize('start', 'S')
+def test_fewer_items_than_earley(grammar):
+    earley = Earley(collect_stats=True)
+    earley.fit(grammar)
+    algo = PracticalEarley(collect_stats=True)
+    algo.fit(grammar)
+    assert algo.predict('aaabbbababab') == earley.predict('aaabbbababab') == True
+    assert algo.stats.counters['items'] < earley.stats.counters['items']
@@ -0,0 +1,102 @@
+from array import array
+import pytest
+
+from conftest import grammar
+from utils import Rule, Grammar
+from earley import Earley
+from lr import LR
+from prefilter import Prefilter
+
+
+@pytest.mark.parametrize('nonterms', [{*'S'}])
+@pytest.mark.parametrize('terms', [{*'()'}])
+@pytest.mark.parametrize('rules', [{Rule('S', '(S)S'), Rule('S', '')}])
+@pytest.mark.parametrize('start', 'S')
+def test_brackets(grammar):
+    prefilter = Prefilter(grammar)
+    assert prefilter.min_length == 0
+    assert prefilter.parity     == 0
+    assert prefilter.first      == {'('}
+    assert prefilter.last       == {')'}
+    assert prefilter.bigrams    == {('(', '('), ('(', ')'), (')', '('), (')', ')')}
+    assert prefilter.accepts('')      == True
+    assert prefilter.accepts('(()')   == False
+    assert prefilter.accepts('(a()')  == False
+    assert prefilter.accepts(')(')    == False
+    assert prefilter.accepts('(()(')  == False
+    assert prefilter.accepts('(())')  == True
+    assert prefilter.accepts(b'(())') == True
+    assert prefilter.accepts(b'))')   == False
+    assert prefilter.stats() == {'checked': 8, 'length': 0, 'parity': 1, 'alphabet': 1,
+                                 'first': 2, 'last': 1, 'bigram': 0}
+
+
+@pytest.mark.parametrize('nonterms', [{*'SAB'}])
+@pytest.mark.parametrize('terms', [{*'abc'}])
+@pytest.mark.parametrize('rules', [{Rule('S', 'AB'), Rule('A', 'aA'), Rule('A', 'a'),
+                                    Rule('B', 'bB'), Rule('B', 'b'), Rule('S', 'Sc'),
+                                    Rule('B', 'Bc')}])
+@pytest.mark.parametrize('start', 'S')
+def test_bigrams(grammar):
+    prefilter = Prefilter(grammar)
+    assert prefilter.min_length == 2
+    assert prefilter.parity     == None
+    assert prefilter.terms      == {*'abc'}
+    assert ('b', 'a') not in prefilter.bigrams
+    assert prefilter.accepts('a')                          == False
+    assert prefilter.accepts('abab')                       == False
+    assert prefilter.accepts(array('i', map(ord, 'abab'))) == False
+    assert prefilter.accepts('aabbcc')                     == True
+    assert prefilter.hits['length'] == 1
+    assert prefilter.hits['bigram'] == 2
+
+
+@pytest.mark.parametrize('nonterms', [{*'SAB'}])
+@pytest.mark.parametrize('terms', [{*'ab'}])
+@pytest.mark.parametrize('rules', [{Rule('S', 'aSb'), Rule('S', ''), Rule('S', 'B'),
+                                    Rule('A', 'b')}])
+@pytest.mark.parametrize('start', 'S')
+def test_useless_symbols(grammar):
+    prefilter = Prefilter(grammar)
+    assert prefilter.parity == 0
+    assert prefilter.bigrams == {('a', 'a'), ('a', 'b'), ('b', 'b')}
+
+
+@pytest.mark.parametrize('nonterms', [{*'SF'}])
+@pytest.mark.parametrize('terms', [{*'ab'}])
+@pytest.mark.parametrize('rules', [{Rule('S', 'aFbF'), Rule('F', 'aFb'), Rule('F', '')}])
+@pytest.mark.parametrize('start', 'S')
+def test_engines(grammar):
+    for algo in [Earley(collect_stats=True, use_dfa=False),
+                 LR(collect_stats=True, use_dfa=False)]:
+        algo.fit(grammar)
+        assert algo.predict('ab')    == True
+        assert algo.predict('aabb')  == True
+        assert algo.predict('abb')   == False
+        assert algo.predict('ba')    == False
+        assert algo.predict('abba')  == False
+        assert algo.prefilter.hits['parity'] == 1
+        assert algo.prefilter.hits['first']  == 1
+        assert algo.prefilter.hits['last']   == 1
+        assert algo.stats.counters['prefiltered'] == 3
+        assert algo.stats.counters['words'] == 2
+
+
+@pytest.mark.parametrize('nonterms', [{*'SAB'}])
+@pytest.mark.parametrize('terms', [{*'abc'}])
+@pytest.mark.parametrize('rules', [{Rule('S', 'aSb'), Rule('S', 'A'), Rule('A', 'B')}])
+@pytest.mark.parametrize('start', 'S')
+def test_known(grammar):
+    prefilter = Prefilter(grammar)
+    assert prefilter.min_length == None
+    for rule in [Rule('B', 'c'), Rule('A', ''), Rule('B', 'BaB')]:
+        grammar.add_rule(rule)
+        prefilter = Prefilter(grammar, prefilter)
+        scratch = Prefilter(grammar)
+        assert prefilter.min_length == scratch.min_length
+        assert prefilter.parity     == scratch.parity
+        assert prefilter.first      == scratch.first
+        assert prefilter.last       == scratch.last
+        assert prefilter.bigrams    == scratch.bigrams
+    assert prefilter.min_length == 0
+    assert prefilter.accepts('acacb') == True
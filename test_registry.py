@@ -0,0 +1,72 @@
+import pytest
+
+from conftest import grammar
+from utils import Rule, Grammar
+from earley import Earley
+from lr import LR
+from registry import ParserRegistry, grammar_key
+
+
+def make_grammar(rules, start='S'):
+    result = Grammar({*'SAB'}, {*'ab'})
+    for rule in rules:
+        result.add_rule(rule)
+    result.start = start
+    return result
+
+
+def test_grammar_key():
+    first = make_grammar([Rule('S', 'aSbS'), Rule('S', '')])
+    second = make_grammar([Rule('S', ''), Rule('S', 'aSbS')])
+    assert grammar_key(first) == grammar_key(second)
+    assert grammar_key(first) != grammar_key(make_grammar([Rule('S', 'aSbS')]))
+    assert grammar_key(first) != grammar_key(make_grammar([Rule('A', 'aAbA'), Rule('A', '')],
+                                                          start='A'))
+
+
+def test_lru_eviction():
+    registry = ParserRegistry(LR, max_entries=2)
+    first = make_grammar([Rule('S', 'aSbS'), Rule('S', '')])
+    second = make_grammar([Rule('S', 'aS'), Rule('S', '')])
+    third = make_grammar([Rule('S', 'ab')])
+    parser = registry.get(first)
+    assert parser.predict('aabb') == True
+    assert registry.get(make_grammar([Rule('S', ''), Rule('S', 'aSbS')])) is parser
+    registry.get(second)
+    registry.get(first)
+    registry.get(third)
+    assert first in registry
+    assert second not in registry
+    assert registry.stats() == {'entries': 2, 'bytes': registry.size, 'hits': 2, 'misses': 3,
+                                'disk_hits': 0, 'evictions': 1}
+
+
+def test_memory_bound():
+    registry = ParserRegistry(Earley, max_bytes=1)
+    registry.get(make_grammar([Rule('S', 'aSbS'), Rule('S', '')]))
+    registry.get(make_grammar([Rule('S', 'ab')]))
+    assert len(registry) == 1
+    assert registry.evictions == 1
+
+
+def test_disk_tier(tmp_path):
+    first = make_grammar([Rule('S', 'aSbS'), Rule('S', '')])
+    registry = ParserRegistry(LR, max_entries=1, disk_dir=tmp_path)
+    registry.get(first)
+    registry.get(make_grammar([Rule('S', 'ab')]))
+    parser = registry.get(first)
+    assert registry.disk_hits == 1
+    assert parser.predict('abab') == True
+    assert parser.predict('abb')  == False
+    assert ParserRegistry(LR, disk_dir=tmp_path).get(first).predict('ab') == True
+
+
+def test_private_copy():
+    registry = ParserRegistry(LR)
+    caller = make_grammar([Rule('S', 'aSb'), Rule('S', '')])
+    parser = registry.get(caller)
+    caller.add_rule(Rule('S', 'ab'))
+    caller.remove_rule(Rule('S', ''))
+    assert parser.predict('') == True
+    assert parser.grammar is not caller
+    assert registry.get(make_grammar([Rule('S', 'aSb'), Rule('S', '')])) is parser
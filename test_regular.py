@@ -0,0 +1,84 @@
+import pytest
+
+from conftest import grammar
+from utils import Rule, Grammar
+from earley import Earley
+from lr import LR
+from regular import DFA, is_left_linear, is_right_linear
+
+
+@pytest.mark.parametrize('nonterms', [{*'S'}])
+@pytest.mark.parametrize('terms', [{*'a'}])
+@pytest.mark.parametrize('rules', [{Rule('S', 'aS'), Rule('S', '')}])
+@pytest.mark.parametrize('start', 'S')
+def test_a_star(grammar):
+    assert is_right_linear(grammar) == True
+    dfa = DFA.from_grammar(grammar)
+    assert dfa.states_count == 1
+    assert dfa.predict('')    == True
+    assert dfa.predict('aaa') == True
+    assert dfa.predict('ab')  == False
+    assert dfa.predict(b'aa') == True
+    assert dfa.predict_many(['a', 'b', 'aa']) == [True, False, True]
+
+
+@pytest.mark.parametrize('nonterms', [{*'SAB'}])
+@pytest.mark.parametrize('terms', [{*'ab'}])
+@pytest.mark.parametrize('rules', [{Rule('S', 'Sab'), Rule('S', 'Ab'), Rule('A', 'Aa'),
+                                    Rule('A', 'a')}])
+@pytest.mark.parametrize('start', 'S')
+def test_left_linear(grammar):
+    assert is_right_linear(grammar) == False
+    assert is_left_linear(grammar)  == True
+    dfa = DFA.from_grammar(grammar)
+    algo = Earley(use_dfa=False)
+    algo.fit(grammar)
+    for word in ['ab', 'aab', 'abab', 'aabab', 'b', 'ba', '', 'abb', 'aaabababab']:
+        assert dfa.predict(word) == algo.predict(word)
+
+
+@pytest.mark.parametrize('nonterms', [{*'SBC'}])
+@pytest.mark.parametrize('terms', [{*'abc'}])
+@pytest.mark.parametrize('rules', [{Rule('S', 'B'), Rule('B', 'baa'), Rule('S', ''),
+                                    Rule('B', 'baaa')}])
+@pytest.mark.parametrize('start', 'S')
+def test_engines_use_dfa(grammar):
+    earley = Earley(collect_stats=True)
+    earley.fit(grammar)
+    lr = LR(collect_stats=True)
+    lr.fit(grammar)
+    assert earley.dfa is not None
+    assert lr.dfa is not None
+    for algo in [earley, lr]:
+        assert algo.predict('baa')   == True
+        assert algo.predict('baaa')  == True
+        assert algo.predict('')      == True
+        assert algo.predict('baaaa') == False
+        assert algo.stats.counters['dfa_words'] == 4
+
+
+@pytest.mark.parametrize('nonterms', [{*'S'}])
+@pytest.mark.parametrize('terms', [{*'()'}])
+@pytest.mark.parametrize('rules', [{Rule('S', '(S)S'), Rule('S', '')}])
+@pytest.mark.parametrize('start', 'S')
+def test_not_regular(grammar):
+    assert DFA.from_grammar(grammar) is None
+
+
+@pytest.mark.parametrize('nonterms', [{*'SABCDEFGHIJKL'}])
+@pytest.mark.parametrize('terms', [{*'ab'}])
+@pytest.mark.parametrize('rules', [{Rule('S', 'aS'), Rule('S', 'bS'), Rule('S', 'aA'),
+                                    *(Rule(left, letter + right)
+                                      for left, right in zip('ABCDEFGHIJK', 'BCDEFGHIJKL')
+                                      for letter in 'ab'),
+                                    Rule('L', 'a'), Rule('L', 'b')}])
+@pytest.mark.parametrize('start', 'S')
+def test_state_cap(grammar):
+    assert DFA.from_grammar(grammar) is None
+    assert DFA.from_grammar(grammar, max_states=2 ** 13).states_count == 2 ** 13
+    earley = Earley(collect_stats=True)
+    earley.fit(grammar)
+    assert earley.dfa is None
+    assert earley.predict('b' + 'a' * 13) == True
+    assert earley.predict('a' + 'b' * 12) == True
+    assert earley.predict('b' * 13)       == False
@@ -0,0 +1,86 @@
+import asyncio
+import json
+import pytest
+
+from conftest import grammar
+from utils import Rule, Grammar
+from earley import Earley
+from lr import LR
+from server import ParseServer
+
+
+async def _ask(server, lines):
+    host, port = server.address()
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(''.join(line + '\n' for line in lines).encode('utf-8'))
+    await writer.drain()
+    result = [(await reader.readline()).decode('utf-8').rstrip('\n') for _ in lines]
+    writer.close()
+    await writer.wait_closed()
+    return result
+
+
+@pytest.mark.parametrize('nonterms', [{*'S'}])
+@pytest.mark.parametrize('terms', [{*'()'}])
+@pytest.mark.parametrize('rules', [{Rule('S', '(S)S'), Rule('S', '')}])
+@pytest.mark.parametrize('start', 'S')
+def test_server(grammar):
+    earley = Earley()
+    earley.fit(grammar)
+    lr = LR()
+    lr.fit(grammar)
+
+    async def run():
+        server = ParseServer({'earley': earley, 'lr': lr}, batch_size=8, max_queue=4)
+        await server.start()
+        try:
+            first, second = await asyncio.gather(
+                _ask(server, ['earley\t(())', 'lr\t(()', 'lr\t', 'other\t()', 'broken']),
+                _ask(server, ['earley\t' + '()' * 20] * 10))
+            stats = json.loads((await _ask(server, ['STATS']))[0])
+        finally:
+            await server.close()
+        return first, second, stats
+
+    first, second, stats = asyncio.run(run())
+    assert first == ['Yes', 'No', 'Yes', 'ERROR unknown grammar other', 'ERROR wrong request format']
+    assert second == ['Yes'] * 10
+    assert stats['requests'] == 14
+    assert stats['batches'] <= 14
+    assert stats['queue_latency_max'] >= 0
+
+
+@pytest.mark.parametrize('nonterms', [{*'S'}])
+@pytest.mark.parametrize('terms', [{*'()'}])
+@pytest.mark.parametrize('rules', [{Rule('S', '(S)S'), Rule('S', '')}])
+@pytest.mark.parametrize('start', 'S')
+def test_bad_input(grammar):
+    lr = LR()
+    lr.fit(grammar)
+
+    async def ask(server, data, count):
+        host, port = server.address()
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(data)
+        await writer.drain()
+        result = [(await reader.readline()).decode('utf-8').rstrip('\n') for _ in range(count)]
+        writer.close()
+        await writer.wait_closed()
+        return result
+
+    async def run():
+        server = ParseServer({'lr': lr}, line_limit=64)
+        await server.start()
+        try:
+            invalid = await ask(server, b'lr\t\xff\nlr\t()\n', 2)
+            long = await ask(server, b'lr\t' + b'()' * 100 + b'\n', 1)
+            after = await _ask(server, ['lr\t(())'])
+        finally:
+            await server.close()
+        return invalid, long, after
+
+    invalid, long, after = asyncio.run(run())
+    assert invalid[0].startswith('ERROR') and 'utf-8' in invalid[0]
+    assert invalid[1] == 'Yes'
+    assert long == ['ERROR line longer than 64 bytes']
+    assert after == ['Yes']
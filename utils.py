@@ -1,5 +1,15 @@
 from __future__ import annotations
-from typing import Set
+import mmap
+import time
+import weakref
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple, Union
+
+from stats import Stats
+
+
+Word = Union[str, bytes, bytearray, memoryview, mmap.mmap, Sequence[int]]
+
+ASSOCIATIVITY = ('left', 'right', 'nonassoc')
 
 
 class Rule:
@@ -25,21 +35,196 @@ class Rule:
         return hash((self.left, self.right))
 
 
+class BudgetExceeded(Exception):
+    def __init__(self, position: int, items: int, elapsed: float) -> BudgetExceeded:
+        super().__init__(f'Budget exceeded at position {position} after {items} items '
+                         f'({elapsed:.6f}s)')
+        self.position = position
+        self.items = items
+        self.elapsed = elapsed
+
+
+class Budget:
+    CHECK_EVERY = 256
+
+    def __init__(self, max_items: Optional[int] = None, deadline: Optional[float] = None,
+                 stats: Optional[Stats] = None) -> Budget:
+        self.max_items = max_items
+        self.deadline = deadline
+        self.stats = stats
+        self.items = 0
+        self.started = time.monotonic()
+        self._next_check = 0
+
+    def spend(self, position: int, items: int = 1) -> None:
+        self.items += items
+        if self.max_items is not None and self.items > self.max_items:
+            raise self.exceeded(position)
+        if self.deadline is not None and self.items >= self._next_check:
+            self._next_check = self.items + self.CHECK_EVERY
+            if time.monotonic() > self.deadline:
+                raise self.exceeded(position)
+
+    def exceeded(self, position: int) -> BudgetExceeded:
+        if self.stats is not None:
+            self.stats.add('budget_exceeded')
+        return BudgetExceeded(position, self.items, time.monotonic() - self.started)
+
+
+class SymbolView:
+    def __init__(self, word: Sequence[int], symbols: Dict[int, str]) -> SymbolView:
+        self.word = word
+        self.symbols = symbols
+
+    def __len__(self) -> int:
+        return len(self.word)
+
+    def __getitem__(self, i: int) -> Optional[str]:
+        return self.symbols.get(self.word[i])
+
+
+def symbol_codes(symbols: Set[str]) -> Dict[int, str]:
+    return {ord(symbol): symbol for symbol in symbols}
+
+
+def as_codes(word: Word) -> Word:
+    if isinstance(word, mmap.mmap):
+        return memoryview(word)
+    return word
+
+
+def as_symbols(word: Word, symbols: Dict[int, str]) -> Union[str, SymbolView]:
+    if isinstance(word, str):
+        return word
+    return SymbolView(as_codes(word), symbols)
+
+
 class Grammar:
     def __init__(self, nonterms: Set[str], terms: Set[str]) -> Grammar:
         self.nonterms = nonterms
         self.terms = terms
         self._rules = set()
+        self._listeners = []
+        self.precedence = {}
 
     def add_rule(self, rule: Rule) -> None:
+        if rule in self._rules:
+            return
         self._rules.add(rule)
+        self._notify(rule, True)
+
+    def remove_rule(self, rule: Rule) -> None:
+        if rule not in self._rules:
+            return
+        self._rules.remove(rule)
+        self._notify(rule, False)
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state['_listeners']
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._listeners = []
+
+    def subscribe(self, listener: Callable[[Optional[Rule], bool], None]) -> None:
+        self._listeners.append(weakref.WeakMethod(listener))
+
+    def unsubscribe(self, listener: Callable[[Optional[Rule], bool], None]) -> None:
+        reference = weakref.WeakMethod(listener)
+        if reference in self._listeners:
+            self._listeners.remove(reference)
+
+    def _notify(self, rule: Optional[Rule], added: bool) -> None:
+        self._listeners = [reference for reference in self._listeners if reference() is not None]
+        for reference in list(self._listeners):
+            listener = reference()
+            if listener is not None:
+                listener(rule, added)
+
+    def declare(self, associativity: str, terms: str) -> None:
+        if associativity not in ASSOCIATIVITY:
+            raise Exception(f'Unknown associativity {associativity}')
+        level = 1 + max((level for level, _ in self.precedence.values()), default=0)
+        for term in terms:
+            if term not in self.terms:
+                raise Exception(f'Precedence declared for non-terminal {term}')
+            self.precedence[term] = (level, associativity)
+        self._notify(None, True)
+
+    def copy(self) -> Grammar:
+        result = Grammar(set(self.nonterms), set(self.terms))
+        result._rules = set(self._rules)
+        result.precedence = dict(self.precedence)
+        result.start = self.start
+        return result
+
+    def rule_precedence(self, rule: Rule) -> Optional[Tuple[int, str]]:
+        for letter in reversed(rule.right):
+            if letter in self.precedence:
+                return self.precedence[letter]
+        return None
 
     def is_terminal(self, letter: str) -> bool:
         return letter in self.terms
 
+    def is_word(self, word: Word) -> bool:
+        if isinstance(word, str):
+            return not word.translate(dict.fromkeys(map(ord, self.terms)))
+        word = as_codes(word)
+        if isinstance(word, (bytes, bytearray)):
+            return not word.translate(None, bytes(code for code in map(ord, self.terms)
+                                                  if code < 256))
+        return set(word).issubset(map(ord, self.terms))
+
     def rules(self) -> Set[Rule]:
         return self._rules
 
+    def rules_by_left(self) -> Dict[str, List[Rule]]:
+        result = {nonterm: [] for nonterm in self.nonterms}
+        for rule in self._rules:
+            result.setdefault(rule.left, []).append(rule)
+        return result
+
+    def nullable(self, known: Optional[Set[str]] = None) -> Set[str]:
+        result = set() if known is None else set(known)
+        changed = True
+        while changed:
+            changed = False
+            for rule in self._rules:
+                if ((rule.left not in result) and
+                        all(letter in result for letter in rule.right)):
+                    result.add(rule.left)
+                    changed = True
+        return result
+
+    def first_sets(self, nullable: Set[str],
+                   known: Optional[Dict[str, Set[str]]] = None) -> Dict[str, Set[str]]:
+        result = {nonterm: set() for nonterm in self.nonterms}
+        for rule in self._rules:
+            for letter in rule.left + rule.right:
+                if letter not in self.terms:
+                    result.setdefault(letter, set())
+        for nonterm, terms in (known or {}).items():
+            if nonterm in result:
+                result[nonterm] |= terms
+        changed = True
+        while changed:
+            changed = False
+            for rule in self._rules:
+                size = len(result[rule.left])
+                for letter in rule.right:
+                    if letter in self.terms:
+                        result[rule.left].add(letter)
+                        break
+                    result[rule.left] |= result[letter]
+                    if letter not in nullable:
+                        break
+                if len(result[rule.left]) != size:
+                    changed = True
+        return result
+
     def is_context_free(self) -> bool:
         for rule in self._rules:
             if (len(rule.left) != 1) or (rule.left not in self.nonterms):